@@ -1,14 +1,39 @@
 import streamlit as st
-import json
-import os
 
 from beat_starter_core import (
     generate_beat_plan,
     save_plan_json,
     export_midi,
-    HAS_MIDI
+    export_take,
+    genre_menu,
+    render_take,
 )
 
+
+# ----------------------------------------------------
+# ♻️ Cached artifacts (shared across reruns and sessions)
+# ----------------------------------------------------
+@st.cache_resource
+def load_genre_tables():
+    """Genre menu, category list and subgenre labels, built once per process."""
+    genre_options = genre_menu()
+    subgenres_map = {cat: [label for label, _ in subs] for cat, subs in genre_options.items()}
+    return genre_options, list(genre_options), subgenres_map
+
+
+@st.cache_data(max_entries=512)
+def build_plan(genre, bpm, mood, energy):
+    """Plan dict plus its JSON bytes for one parameter set."""
+    plan = generate_beat_plan(genre=genre, bpm=bpm, mood=mood, energy=energy, bars=8)
+    return plan, save_plan_json(plan, None)
+
+
+@st.cache_resource(max_entries=64)
+def build_seeded_take(genre, mood, energy, seed, **options):
+    """Quantized take of a seeded request (deterministic, so safe to share; read-only).
+    Not keyed on bpm or humanize_intensity: those only re-run the last stages."""
+    return render_take({"genre": genre, "mood": mood, "energy": energy}, seed=seed, **options)
+
 # ----------------------------------------------------
 # 🎛️ Streamlit UI
 # ----------------------------------------------------
@@ -34,98 +59,15 @@ st.divider()
 # Categorized Genre/Subgenre selection
 st.subheader("🎼 Style Selector")
 
-genre_categories = [
-    "Drum & Bass",
-    "Hip-Hop",
-    "House",
-    "Reggaeton",
-    "Pop",
-    "Rock",
-    "Afrobeat",
-    "Jazz",
-    "Techno",
-    "Trance",
-    "Industrial / EBM / Electro",
-    "Lo-Fi",
-    "Experimental",
-]
+# Categories, subgenres and internal genre keys all come from the core genre registry
+genre_options, genre_categories, subgenres_map = load_genre_tables()
 
 category = st.selectbox("Main Genre", genre_categories, index=0)
 
-subgenres_map = {
-    "Drum & Bass": ["Classic (Amen/Think)", "Liquid", "Stepper (Chase & Status)", "Neurofunk"],
-    "Hip-Hop": ["Boom Bap (DJ Premier)", "West Coast (Dr. Dre)", "Trap"],
-    "House": ["Classic House", "Tech House", "Deep House", "UK Garage"],
-    "Reggaeton": ["Dembow"],
-    "Pop": ["Standard"],
-    "Rock": ["Standard"],
-    "Afrobeat": ["Modern"],
-    "Jazz": ["Swing"],
-    "Techno": ["Standard", "Peak", "Acid"],
-    "Trance": ["Uplifting", "Standard"],
-    "Industrial / EBM / Electro": ["Industrial", "EBM", "Electro"],
-    "Lo-Fi": ["Standard"],
-    "Experimental": ["Standard"],
-}
-
 subgenre = st.selectbox("Subgenre", subgenres_map.get(category, ["Standard"]))
 
 # Compose internal genre key compatible with core
-if category == "Drum & Bass":
-    if "Classic" in subgenre:
-        genre = "drum_and_bass_classic"
-    elif "Liquid" in subgenre:
-        genre = "drum_and_bass_liquid"
-    elif "Stepper" in subgenre:
-        genre = "drum_and_bass_stepper"
-    else:
-        genre = "drum_and_bass_neuro"
-elif category == "Hip-Hop":
-    if "Boom Bap" in subgenre:
-        genre = "hiphop_boom_bap"
-    elif "West Coast" in subgenre:
-        genre = "hiphop_west_coast"
-    else:
-        genre = "hiphop_trap"
-elif category == "House":
-    if subgenre == "Tech House":
-        genre = "tech_house"
-    elif subgenre == "Deep House":
-        genre = "deep_house"
-    elif subgenre == "UK Garage":
-        genre = "uk_garage"
-    else:
-        genre = "house"
-elif category == "Reggaeton":
-    genre = "reggaeton_dembow"
-elif category == "Pop":
-    genre = "pop"
-elif category == "Rock":
-    genre = "rock"
-elif category == "Afrobeat":
-    genre = "afrobeat"
-elif category == "Jazz":
-    genre = "jazz_swing"
-elif category == "Techno":
-    if subgenre == "Peak":
-        genre = "techno_peak"
-    elif subgenre == "Acid":
-        genre = "techno_acid"
-    else:
-        genre = "techno"
-elif category == "Trance":
-    genre = "trance"
-elif category == "Industrial / EBM / Electro":
-    if subgenre == "Industrial":
-        genre = "industrial"
-    elif subgenre == "EBM":
-        genre = "ebm"
-    else:
-        genre = "electro"
-elif category == "Lo-Fi":
-    genre = "lofi"
-else:
-    genre = "experimental"
+genre = dict(genre_options[category]).get(subgenre, "default")
 
 mood = st.text_input("🌈 Mood (optional, e.g. dark, uplifting, chill)", "dark")
 energy = st.slider("⚡ Energy (1 = low, 10 = high)", 1, 10, 7)
@@ -176,77 +118,78 @@ midi_option = st.radio(
 # Option to include melody in MIDI export
 include_melody = st.checkbox("Include Melody (lead track)", value=True)
 
+# Full arrangement: one 8-bar section per entry of the plan structure (Intro → Outro)
+arrange = st.checkbox("Full Arrangement (Intro → Outro)", value=False, help="Render every section of the plan structure instead of a single 8-bar loop.")
+
 st.divider()
 
 # ----------------------------------------------------
 # 🚀 Generate Beat Plan
 # ----------------------------------------------------
+# Everything that shapes the output; artifacts are reused while these stay the same
+include_bass = midi_option == "Drums + Bass (recommended)"
+params = {
+    "genre": genre, "bpm": int(bpm), "mood": mood, "energy": int(energy), "seed": int(seed),
+    "midi_option": midi_option, "include_bass": include_bass, "include_melody": include_melody,
+    "break_preset": break_preset, "snare_snap": snare_snap, "hat_layout": hat_layout,
+    "humanize_intensity": humanize_intensity, "lofi_vinyl": lofi_vinyl, "arrange": arrange,
+}
+
 if st.button("🎶 Generate Beat Plan"):
     st.info("Generating your beat plan...")
 
-    plan = generate_beat_plan(genre=genre, bpm=bpm, mood=mood, energy=energy, bars=8)
-
-    # Display plan as JSON
-    st.subheader("📊 Beat Plan (Preview)")
-    st.json(plan)
-
-    # Save JSON
-    json_filename = "beat_plan.json"
-    save_plan_json(plan, json_filename)
-    with open(json_filename, "rb") as f:
-        st.download_button("📥 Download JSON Plan", data=f, file_name=json_filename, mime="application/json")
+    plan, json_bytes = build_plan(genre, int(bpm), mood, int(energy))
 
     # ------------------------------------------------
     # 🎹 MIDI Export
     # ------------------------------------------------
+    midi_bytes = None
     if midi_option != "None (JSON only)":
-        if not HAS_MIDI:
-            st.error(
-                "❌ pretty_midi is not installed, so MIDI export isn't available.\n\n"
-                "👉 To enable it, run this command on your server:\n\n"
-                "```bash\npip install pretty_midi\n```"
-            )
+        st.info("Exporting MIDI...")
+        options = dict(
+            include_bass=include_bass,
+            include_melody=include_melody,
+            break_preset=break_preset,
+            snare_snap=snare_snap,
+            hat_layout=hat_layout,
+            lofi_vinyl=lofi_vinyl
+        )
+        if arrange:
+            midi_bytes = export_midi(plan, filename=None, seed=int(seed) or None, humanize_intensity=humanize_intensity,
+                                     arrange=True, **options)
+        elif seed:
+            # Feel tweaks (humanize, bpm) reuse the cached take and redo only swing/humanize + tempo
+            take = build_seeded_take(genre, mood, int(energy), int(seed), **options)
+            midi_bytes = export_take(take, None, humanize_intensity=humanize_intensity, bpm=int(bpm))
         else:
-            st.info("Exporting MIDI...")
-
-            include_bass = midi_option == "Drums + Bass (recommended)"
-            # Build filename based on genre and BPM
-            genre_key = genre.strip().lower().replace(" ", "_") if genre else "beat"
-            midi_filename = f"{genre_key}_{int(bpm)}bpm.mid"
-            
-            # Pass DnB-specific parameters if applicable
-            if "drum_and_bass" in genre.lower():
-                export_midi(
-                    plan, 
-                    filename=midi_filename, 
-                    include_bass=include_bass, 
-                    include_melody=include_melody,
-                    break_preset=break_preset,
-                    snare_snap=snare_snap,
-                    hat_layout=hat_layout,
-                    humanize_intensity=humanize_intensity,
-                    seed=seed,
-                    lofi_vinyl=lofi_vinyl
-                )
-            else:
-                export_midi(
-                    plan,
-                    filename=midi_filename,
-                    include_bass=include_bass,
-                    include_melody=include_melody,
-                    humanize_intensity=humanize_intensity,
-                    seed=seed,
-                    lofi_vinyl=lofi_vinyl
-                )
-
-            # Offer MIDI download
-            with open(midi_filename, "rb") as f:
-                st.download_button(
-                    "🎧 Download MIDI File",
-                    data=f,
-                    file_name=midi_filename,
-                    mime="audio/midi"
-                )
+            # Seed 0 asks for a fresh groove on every click, so it is never cached
+            midi_bytes = export_midi(plan, filename=None, seed=None, humanize_intensity=humanize_intensity, **options)
+
+    # Keep the artifacts for this session so later reruns (downloads, unrelated widgets) reuse them
+    st.session_state["artifacts"] = {"params": params, "plan": plan, "json": json_bytes, "midi": midi_bytes}
+
+artifacts = st.session_state.get("artifacts")
+if artifacts is not None and artifacts["params"] == params:
+    # Display plan as JSON
+    st.subheader("📊 Beat Plan (Preview)")
+    st.json(artifacts["plan"])
+
+    # Serialize JSON in memory (no shared files between sessions)
+    json_filename = "beat_plan.json"
+    st.download_button("📥 Download JSON Plan", data=artifacts["json"], file_name=json_filename, mime="application/json")
+
+    if artifacts["midi"] is not None:
+        # Build filename based on genre and BPM
+        genre_key = genre.strip().lower().replace(" ", "_") if genre else "beat"
+        midi_filename = f"{genre_key}_{int(bpm)}bpm.mid"
+
+        # Offer MIDI download straight from memory
+        st.download_button(
+            "🎧 Download MIDI File",
+            data=artifacts["midi"],
+            file_name=midi_filename,
+            mime="audio/midi"
+        )
 
     st.success("✅ Done! Your beat plan and MIDI skeleton are ready.")
 
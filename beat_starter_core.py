@@ -1,19 +1,43 @@
 # beat_starter_core.py
 # Advanced Beat Starter core with pro MIDI generation
 # Drop this file in your project replacing the previous core.
-# Requires: pretty_midi for MIDI export (pip install pretty_midi)
+# Requires: numpy. pretty_midi is optional (export_midi(writer="pretty_midi"); pip install pretty_midi)
 
 import random
 import json
 import math
-
-# Try importing pretty_midi (for MIDI export)
-try:
-    import pretty_midi
-    HAS_MIDI = True
-except Exception:
-    pretty_midi = None
-    HAS_MIDI = False
+import functools
+import io
+import os
+import hashlib
+import tempfile
+import threading
+import atexit
+import time
+import tracemalloc
+from collections import OrderedDict
+import importlib.util
+
+# numpy stays an eager import: the pitch/velocity tables and the genre registry are
+# built from it at import time, and every export path runs on it
+import numpy as np
+
+# pretty_midi (and the mido stack behind it) is only needed by writer="pretty_midi",
+# so it is imported on first use; HAS_MIDI is a cheap probe that imports nothing.
+pretty_midi = None
+HAS_MIDI = importlib.util.find_spec("pretty_midi") is not None
+
+
+def _load_pretty_midi():
+    """Import pretty_midi on first use (ImportError if it is not installed)."""
+    global pretty_midi
+    if pretty_midi is None:
+        try:
+            import pretty_midi as module
+        except Exception as exc:
+            raise ImportError("pretty_midi is not installed. Run: pip install pretty_midi") from exc
+        pretty_midi = module
+    return pretty_midi
 
 
 # -------------------------
@@ -34,6 +58,7 @@ GENRE_ROOTS = {
     "ebm": 38,          # D2#
     "electro": 37,      # C#2
     "trance": 48,       # C3
+    "trance_uplifting": 48,
     "house": 36,
     "tech_house": 36,
     "deep_house": 36,
@@ -54,11 +79,30 @@ GENRE_ROOTS = {
 def pick_genre_root(genre_key):
     return GENRE_ROOTS.get(genre_key, GENRE_ROOTS["default"])
 
+# Pitch tables, built once at import: _PITCH_TABLE[scale][root] holds the scale's pitches
+# from every root (0..127) over _PITCH_OCTAVES octaves, one row per octave.
+_PITCH_OCTAVES = 4
+_PITCH_TABLE = {
+    name: (np.arange(128)[:, None, None] + 12 * np.arange(_PITCH_OCTAVES)[None, :, None]
+           + np.asarray(intervals)[None, None, :])
+    for name, intervals in SCALES.items()
+}
+
+
+def _pitch_rows(root, scale_name):
+    """Per-octave pitch rows (lists) of a scale from root: rows[octave][degree]."""
+    return _PITCH_TABLE.get(scale_name, _PITCH_TABLE["minor"])[root].tolist()
+
+
 def scale_notes(root_midi, scale_name="minor", octave=0, length=8):
     """
     Return a list of MIDI note numbers following the given scale starting at root_midi.
     length = how many notes to return (repeats up octaves as needed).
     """
+    table = _PITCH_TABLE.get(scale_name, _PITCH_TABLE["minor"])
+    scale_len = table.shape[2]
+    if 0 <= root_midi < 128 and 0 <= octave and octave * scale_len + length <= table[0].size:
+        return table[int(root_midi)].ravel()[octave * scale_len:octave * scale_len + length].tolist()
     intervals = SCALES.get(scale_name, SCALES["minor"])
     notes = []
     scale_len = len(intervals)
@@ -69,6 +113,250 @@ def scale_notes(root_midi, scale_name="minor", octave=0, length=8):
     return notes
 
 
+# -------------------------
+# Random number generators
+# -------------------------
+# Every generator takes an explicit `rng` (random.Random or numpy.random.Generator)
+# instead of drawing from the process-global random module, so concurrent sessions
+# never interleave their draws and a seed reproduces at any concurrency level.
+def _seed_entropy(seed):
+    """
+    Seed entropy for any int seed. NumPy only takes non-negative seeds, so negative
+    ones wrap to 64 bits (-5 -> 2**64 - 5) and stay reproducible; non-int seeds raise.
+    """
+    seed = int(seed)
+    return seed if seed >= 0 else seed & ((1 << 64) - 1)
+
+
+def make_rng(seed=None):
+    """Per-request NumPy Generator; seed None/0 means fresh OS entropy."""
+    return np.random.default_rng(_seed_entropy(seed) if seed else None)
+
+
+def _np_rng(rng):
+    """Coerce rng (Generator, random.Random, int seed or None) to a numpy Generator."""
+    if isinstance(rng, np.random.Generator):
+        return rng
+    if isinstance(rng, random.Random):
+        return np.random.default_rng(rng.getrandbits(64))
+    return np.random.default_rng(None if rng is None else _seed_entropy(rng))
+
+
+def _py_rng(rng):
+    """Coerce rng (random.Random, Generator, int seed or None) to a random.Random."""
+    if isinstance(rng, random.Random):
+        return rng
+    if isinstance(rng, np.random.Generator):
+        return random.Random(int(rng.integers(1 << 63)))
+    return random.Random(rng)
+
+
+# Counter-based bar randomness: every track of a render gets a 64-bit key, and each
+# bar draws from a stateless hash of (key, bar, stream, index) instead of advancing a
+# shared sequential stream. Any bar range can be generated on its own - out of order,
+# in parallel or on demand - and matches the same bars of a longer render exactly.
+TRACKS = ("drums", "perc", "bass", "melody")
+_STREAM_GRID, _STREAM_HUMANIZE, _STREAM_BAR, _STREAM_LINE = range(4)
+_GOLDEN = np.uint64(0x9E3779B97F4A7C15)
+
+
+def track_key(rng, track):
+    """
+    64-bit key for one track. An int seed maps to the same key every time (per track);
+    a Generator/random.Random gives up 64 bits of its stream; None means fresh entropy.
+    """
+    if isinstance(rng, np.random.Generator):
+        return int(rng.integers(0, 1 << 64, dtype=np.uint64))
+    if isinstance(rng, random.Random):
+        return rng.getrandbits(64)
+    entropy = None if rng is None else [_seed_entropy(rng), TRACKS.index(track)]
+    return int(np.random.SeedSequence(entropy).generate_state(1, np.uint64)[0])
+
+
+def _mix64(x):
+    """splitmix64 finalizer on uint64 arrays."""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _counter_bits(key, bar, stream, index):
+    """64 hashed bits per element of the broadcast (bar, index) arrays."""
+    with np.errstate(over="ignore"):
+        x = _mix64(np.uint64(key) ^ ((np.asarray(bar).astype(np.uint64) + np.uint64(1)) * _GOLDEN))
+        x = _mix64(x ^ ((np.uint64(stream) + np.uint64(1)) * _GOLDEN))
+        return _mix64(x ^ ((np.asarray(index).astype(np.uint64) + np.uint64(1)) * _GOLDEN))
+
+
+def _counter_uniforms(key, bar, stream, index):
+    """Uniforms in [0, 1) for the broadcast (bar, index) arrays of one key and stream."""
+    return (_counter_bits(key, bar, stream, index) >> np.uint64(11)) * (1.0 / (1 << 53))
+
+
+def _bar_random(key, bar, stream=_STREAM_BAR):
+    """random.Random for the sequential draws of one bar (or, with _STREAM_LINE, of a whole line)."""
+    return random.Random(int(_counter_bits(key, bar, stream, 0)))
+
+
+def _bar_randoms(key, first_bar, bars):
+    """(bar, random.Random) for every bar of a range, seeded in one vectorized hash."""
+    seeds = _counter_bits(key, np.arange(first_bar, first_bar + bars), _STREAM_BAR, 0).tolist()
+    return zip(range(first_bar, first_bar + bars), map(random.Random, seeds))
+
+
+# -------------------------
+# Energy curves
+# -------------------------
+# Energy is a 1..10 scalar or a per-bar curve of levels (e.g. ramping across a build).
+# Generators turn it into per-bar arrays and evaluate energy-dependent choices as
+# masks against them; a constant curve behaves exactly like the scalar.
+def _energy_levels(energy):
+    """Round and clip energy to the int levels 1..10: a scalar gives one level, a curve an int array."""
+    if np.ndim(energy) == 0:
+        return int(np.rint(float(max(1, min(10, energy)))))
+    if not len(energy):
+        raise ValueError("energy curve is empty")
+    return np.clip(np.rint(np.asarray(energy, dtype=np.float64)), 1, 10).astype(np.int64)
+
+
+def _energy_at(energy, bar):
+    """Energy at the bars in `bar`; scalars pass through, a curve holds its last level past its end."""
+    if np.ndim(energy) == 0:
+        return energy
+    return energy[np.minimum(bar, len(energy) - 1)].astype(np.float64)
+
+
+def _bar_energies(energy, first_bar, bars):
+    """Per-bar energy array over a bar range."""
+    return np.zeros(bars) + _energy_at(energy, np.arange(first_bar, first_bar + bars))
+
+
+def _mean_energy(energy):
+    """Single energy level for whole-export decisions (tempo, arrangement base)."""
+    return energy if np.ndim(energy) == 0 else int(round(float(np.mean(energy))))
+
+
+# -------------------------
+# Event container (struct-of-arrays)
+# -------------------------
+PPQ = 960  # ticks per quarter note on the internal event timeline
+# Fixed millisecond-style offsets (nudges, jitter, drum hit lengths) are expressed in
+# ticks at this reference tempo, so the timeline never depends on the output tempo.
+REFERENCE_BPM = 120
+_REF_TICKS_PER_SECOND = REFERENCE_BPM / 60.0 * PPQ
+
+
+def _midi7(values):
+    """Clip to the 0..127 MIDI data range and store as uint8."""
+    arr = np.asarray(values)
+    if arr.dtype == np.uint8:
+        return arr
+    return np.clip(arr, 0, 127).astype(np.uint8)
+
+
+class EventBlock:
+    """
+    Compact block of note events backed by NumPy arrays instead of (t, pitch, vel, dur) tuples.
+    tick: int32 onset in PPQ ticks, pitch/vel: uint8, dur: int32 length in ticks.
+    """
+    __slots__ = ("tick", "pitch", "vel", "dur")
+
+    def __init__(self, tick=(), pitch=(), vel=(), dur=()):
+        self.tick = np.asarray(tick, dtype=np.int32)
+        self.pitch = _midi7(pitch)
+        self.vel = _midi7(vel)
+        self.dur = np.asarray(dur, dtype=np.int32)
+
+    @classmethod
+    def from_seconds(cls, times, pitch, vel, dur, bpm):
+        """Build a block from times/durations in seconds at the given tempo."""
+        ticks_per_second = bpm / 60.0 * PPQ
+        tick = np.maximum(0, np.rint(np.asarray(times, dtype=np.float64) * ticks_per_second))
+        dur_ticks = np.maximum(1, np.rint(np.asarray(dur, dtype=np.float64) * ticks_per_second))
+        return cls(tick, pitch, vel, dur_ticks)
+
+    @classmethod
+    def from_tuples(cls, events, bpm=None):
+        """
+        Convert a list of (time, pitch, vel, dur) tuples. Times/durations are ticks
+        (rounded) by default, or seconds at `bpm` when a tempo is given.
+        """
+        if not events:
+            return cls()
+        times, pitch, vel, dur = zip(*events)
+        if bpm is not None:
+            return cls.from_seconds(times, pitch, vel, dur, bpm)
+        return cls(np.maximum(0, np.rint(times)), pitch, vel, np.maximum(1, np.rint(dur)))
+
+    @classmethod
+    def concatenate(cls, blocks):
+        blocks = [b for b in blocks if len(b)]
+        if not blocks:
+            return cls()
+        return cls(np.concatenate([b.tick for b in blocks]),
+                   np.concatenate([b.pitch for b in blocks]),
+                   np.concatenate([b.vel for b in blocks]),
+                   np.concatenate([b.dur for b in blocks]))
+
+    def __len__(self):
+        return len(self.tick)
+
+    def __getitem__(self, index):
+        """Index with a slice, mask or index array; always returns an EventBlock."""
+        return EventBlock(self.tick[index], self.pitch[index], self.vel[index], self.dur[index])
+
+    def __iter__(self):
+        """Yield (tick, pitch, vel, dur) as plain ints."""
+        return zip(self.tick.tolist(), self.pitch.tolist(), self.vel.tolist(), self.dur.tolist())
+
+    def __repr__(self):
+        return f"EventBlock({len(self)} events)"
+
+    @classmethod
+    def merge(cls, blocks):
+        """
+        Merge blocks that are each ordered by tick (stable: ties keep block order).
+        Blocks laid out in time order (bar ranges, arrangement tiles, stream chunks) only
+        overlap around their boundaries, so after one O(n) pass just those windows are
+        re-sorted instead of the whole concatenation.
+        """
+        merged = cls.concatenate(blocks)
+        tick = merged.tick
+        descent = tick[1:] < tick[:-1]
+        if not descent.any():
+            return merged
+        # Clean split before element i: everything earlier <= everything from i on. Only the
+        # segments between clean splits that contain a descent need sorting, and since the
+        # segments are ordered by value, one stable sort of their elements puts each in place.
+        clean = np.maximum.accumulate(tick[:-1]) <= np.minimum.accumulate(tick[::-1])[::-1][1:]
+        segment = np.concatenate([[0], np.cumsum(clean)])
+        dirty = np.zeros(segment[-1] + 1, dtype=bool)
+        dirty[segment[1:][descent]] = True
+        idx = np.flatnonzero(dirty[segment])
+        order = np.arange(len(tick))
+        order[idx] = idx[np.argsort(tick[idx], kind="stable")]
+        return merged[order]
+
+    def sorted(self):
+        """Return the block ordered by onset tick (stable, so simultaneous hits keep their order)."""
+        if not (self.tick[1:] < self.tick[:-1]).any():
+            return self  # already ordered: one O(n) check instead of a sort
+        return self[np.argsort(self.tick, kind="stable")]
+
+    def slice_time(self, start, end):
+        """Events with start <= tick < end; the block must already be sorted."""
+        lo, hi = np.searchsorted(self.tick, [start, end], side="left")
+        return self[lo:hi]
+
+    def shifted(self, ticks):
+        return EventBlock(self.tick + np.int32(ticks), self.pitch, self.vel, self.dur)
+
+    def seconds(self, bpm):
+        """Return (start_seconds, duration_seconds) float arrays at the given tempo."""
+        seconds_per_tick = 60.0 / (bpm * PPQ)
+        return self.tick * seconds_per_tick, self.dur * seconds_per_tick
+
+
 # -------------------------
 # Drum rhythm helpers
 # -------------------------
@@ -78,13 +366,30 @@ def quantize_time(t, grid):
 
 def add_note(instrument, pitch, start, duration, velocity=100):
     """Add a single note to a pretty_midi.Instrument (safeguard)."""
-    instrument.notes.append(pretty_midi.Note(velocity=int(velocity),
+    instrument.notes.append(_load_pretty_midi().Note(velocity=int(velocity),
                                              pitch=int(pitch),
                                              start=float(start),
                                              end=float(start + max(0.01, duration))))
 
+def _add_block(instrument, block, bpm):
+    """Add every note of an EventBlock to a pretty_midi.Instrument, rendered at `bpm`."""
+    starts, durs = block.seconds(bpm)
+    for start, duration, pitch, vel in zip(starts.tolist(), durs.tolist(), block.pitch.tolist(), block.vel.tolist()):
+        add_note(instrument, pitch, start, duration, vel)
+
+# Velocity LUT, built once at import: _VELOCITY_LUT[base, variation, round(level * 100)]
+_VELOCITY_LUT = np.clip(
+    (np.arange(128)[:, None, None]
+     + np.arange(33)[None, :, None] * (np.arange(101)[None, None, :] / 100.0 - 0.5)).astype(np.int64),
+    25, 127).astype(np.uint8)
+
+
 def velocity_for(level, base=80, variation=12):
     """Return velocity based on level 0.0..1.0"""
+    k = int(level * 100.0 + 0.5)
+    if 0 <= k <= 100 and k / 100.0 == level and type(base) is int and type(variation) is int \
+            and 0 <= base < 128 and 0 <= variation < 33:
+        return _VELOCITY_LUT.item(base, variation, k)  # levels on the 0.01 grid
     v = base + (variation * (level - 0.5))
     return max(25, min(127, int(v)))
 
@@ -92,38 +397,50 @@ def velocity_for(level, base=80, variation=12):
 # ---------------------------------
 # Groove: swing & humanization helper
 # ---------------------------------
-def apply_swing_and_humanization(events, genre_key, energy_norm, swing_amount=0.06, humanize_intensity=0.6, bpm=120):
+def apply_swing_and_humanization(events, genre_key, energy_norm, swing_amount=0.06, humanize_intensity=0.6, bpm=120, rng=None, uniforms=None):
     """
-    Apply genre-specific swing and humanization to event list (t, pitch, vel, dur).
+    Apply genre-specific swing and humanization to an EventBlock (tick timeline)
+    or to a legacy event list of (t_seconds, pitch, vel, dur) tuples at `bpm`;
+    returns the same kind. Blocks never depend on bpm.
+    rng: random.Random or numpy Generator for the jitter draws (fresh entropy if None).
+    uniforms: optional (velocity, timing) arrays of [0, 1) draws for a block, used
+              instead of rng (the counter-based generators pass per-bar draws here).
     Enhanced for better musical cohesion and natural feel.
     """
     humanized = []
     
-    # Genre-specific swing patterns
-    if "drum_and_bass" in genre_key:
-        # DnB typically uses less swing, more about timing precision
-        swing_amount *= 0.5  # Reduce swing for DnB
-        timing_humanize_range = 0.003  # Very tight timing
-        vel_humanize_range = 0.03  # Subtle velocity variation
-    elif "hiphop" in genre_key or "boom_bap" in genre_key:
-        # Hip-hop benefits from more swing and looser timing
-        swing_amount *= 1.2
-        timing_humanize_range = 0.008
-        vel_humanize_range = 0.06
-    elif "techno" in genre_key or "industrial" in genre_key:
-        # Techno needs mechanical precision
-        swing_amount *= 0.3
-        timing_humanize_range = 0.002
-        vel_humanize_range = 0.02
-    else:
-        # Default settings
-        timing_humanize_range = 0.005
-        vel_humanize_range = 0.04
+    # Genre-specific swing patterns (see _SWING_PROFILES)
+    swing_scale, timing_humanize_range, vel_humanize_range = genre_profile(genre_key)["swing"]
+    swing_amount *= swing_scale
     
     # Energy affects humanization - higher energy = tighter; scaled by humanize_intensity (0..1.2)
+    # (blocks may pass a per-event energy array)
     energy_factor = 1.0 - (energy_norm - 5) * 0.05
-    energy_factor = max(0.5, min(1.0, energy_factor)) * max(0.2, min(1.2, humanize_intensity))
+    if np.ndim(energy_factor):
+        energy_factor = np.clip(energy_factor, 0.5, 1.0) * max(0.2, min(1.2, humanize_intensity))
+    else:
+        energy_factor = max(0.5, min(1.0, energy_factor)) * max(0.2, min(1.2, humanize_intensity))
     
+    if isinstance(events, EventBlock):
+        # Batched path: same distributions as the per-event loop below, in a few array ops
+        n = len(events)
+        ticks_per_second = _REF_TICKS_PER_SECOND
+        beat_phase = events.tick % PPQ
+        is_off_sixteenth = (((beat_phase >= PPQ // 4) & (beat_phase < PPQ // 2))
+                            | (beat_phase >= 3 * PPQ // 4))
+        if uniforms is None:
+            rng = _np_rng(rng)
+            vel_variation = rng.uniform(-vel_humanize_range, vel_humanize_range, n) * energy_factor
+            timing_humanize = rng.uniform(-timing_humanize_range, timing_humanize_range, n) * energy_factor
+        else:
+            u_vel, u_time = uniforms
+            vel_variation = (2.0 * u_vel - 1.0) * vel_humanize_range * energy_factor
+            timing_humanize = (2.0 * u_time - 1.0) * timing_humanize_range * energy_factor
+        new_vel = np.clip((events.vel * (1 + vel_variation)).astype(np.int64), 1, 127)
+        new_t = events.tick + is_off_sixteenth * (swing_amount * PPQ) + timing_humanize * ticks_per_second
+        return EventBlock(np.maximum(0, np.rint(new_t)), events.pitch, new_vel, events.dur)
+
+    rng = _py_rng(rng)
     seconds_per_beat = 60.0 / max(1, bpm)
     for t, pitch, vel, dur in events:
         # Swing: shift every other 16th note
@@ -140,11 +457,11 @@ def apply_swing_and_humanization(events, genre_key, energy_norm, swing_amount=0.
             new_t = t
         
         # Velocity humanization - genre and energy dependent
-        vel_variation = random.uniform(-vel_humanize_range, vel_humanize_range) * energy_factor
+        vel_variation = rng.uniform(-vel_humanize_range, vel_humanize_range) * energy_factor
         new_vel = max(1, min(127, int(vel * (1 + vel_variation))))
         
         # Micro-timing humanization - very subtle and genre-dependent
-        timing_humanize = random.uniform(-timing_humanize_range, timing_humanize_range) * energy_factor
+        timing_humanize = rng.uniform(-timing_humanize_range, timing_humanize_range) * energy_factor
         new_t += timing_humanize
         
         # Ensure we don't go negative in time
@@ -160,13 +477,15 @@ def apply_swing_and_humanization(events, genre_key, energy_norm, swing_amount=0.
 def _genre_key(genre_input):
     return genre_input.strip().lower().replace(" ", "_")
 
-def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset="amen", snare_snap=False, hat_layout="standard", humanize_intensity=0.6, lofi_vinyl=False):
+def _generate_drum_events_legacy(genre, bpm, energy=5, bars=8, swing=0.06, break_preset="amen", snare_snap=False, hat_layout="standard", humanize_intensity=0.6, lofi_vinyl=False, rng=None):
     """
+    Original per-hit drum generator, kept for comparison with the step-grid engine.
     Generate a list of drum events (tuples): (time_seconds, midi_note, velocity, duration)
     We'll create percussive events for Kick(36), Snare(38), Hat closed(42), Hat open(46), Clap(39), Tom(48), Perc hits.
     energy: 1..10 controlling density and extra hits
     swing: fraction of a beat to swing 16th notes (positive shifts every other 16th)
     """
+    rng = _py_rng(rng)
     beats_per_bar = 4
     seconds_per_beat = 60.0 / bpm
     seconds_per_bar = seconds_per_beat * beats_per_bar
@@ -192,7 +511,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
             if beat_idx % 4 in (1, 3):
                 events.append((t, 39, velocity_for(0.88), 0.06))  # clap
             # Perc blips
-            if random.random() < 0.25:
+            if rng.random() < 0.25:
                 events.append((t + seconds_per_beat*0.25, 49, velocity_for(0.55), 0.05))
 
     elif "deep_house" in genre_key:
@@ -203,7 +522,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
             events.append((t + seconds_per_beat * 0.5, 46, velocity_for(0.7), 0.1))
             if beat_idx % 4 in (1, 3):
                 events.append((t, 39, velocity_for(0.78), 0.06))
-            if random.random() < 0.15:
+            if rng.random() < 0.15:
                 events.append((t + seconds_per_beat*0.75, 51, velocity_for(0.55), 0.08))  # ride
 
     elif "uk_garage" in genre_key:
@@ -226,7 +545,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                     v = velocity_for(0.6)
                 else:
                     v = velocity_for(0.5)
-                if random.random() < 0.9:
+                if rng.random() < 0.9:
                     events.append((th, 42, v, 0.02))
 
     elif "house" in genre_key:
@@ -245,7 +564,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
         # Small variations
         if energy_norm >= 6:
             for _ in range(bars):
-                tt = random.uniform(0, seconds_per_bar * bars)
+                tt = rng.uniform(0, seconds_per_bar * bars)
                 events.append((tt, 42, velocity_for(0.6), 0.02))
 
     elif "reggaeton_dembow" in genre_key:
@@ -263,7 +582,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                 th = bar_start + i * (seconds_per_bar / 8.0)
                 events.append((th, 42, velocity_for(0.58), 0.03))
             # Shaker swing feel
-            if random.random() < 0.5:
+            if rng.random() < 0.5:
                 for i in [1,3,5,7]:
                     ts = bar_start + i * (seconds_per_bar/8.0) + 0.01
                     events.append((ts, 82, velocity_for(0.45), 0.05))
@@ -287,20 +606,20 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
             if beat_idx % 4 in (1, 3):
                 if is_peak and energy_norm >= 5:
                     events.append((t, 39, velocity_for(0.78), 0.05))
-                elif random.random() < 0.35:
+                elif rng.random() < 0.35:
                     events.append((t, 39, velocity_for(0.68), 0.05))
 
             # Metallic ticks slightly after the kick to add grit
-            if beat_idx % 2 == 0 and random.random() < (0.35 if is_peak else 0.25):
+            if beat_idx % 2 == 0 and rng.random() < (0.35 if is_peak else 0.25):
                 events.append((t + seconds_per_beat * 0.25, 49, velocity_for(0.52), 0.04))  # perc
             # Short ride ping occasionally (peak)
-            if is_peak and random.random() < 0.15:
+            if is_peak and rng.random() < 0.15:
                 events.append((t + seconds_per_beat * 0.75, 51, velocity_for(0.5), 0.04))
 
             # Acid accent: extra 16th off-hat in last quarter
             if is_acid:
                 q4 = t + seconds_per_beat * 0.75
-                if random.random() < 0.5:
+                if rng.random() < 0.5:
                     events.append((q4 + seconds_per_beat * 0.125, 42, velocity_for(0.58), 0.015))
 
         # Section marker: crash only at start when energy is high
@@ -320,10 +639,10 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                 if s % 2 == 0:
                     events.append((st, 42, velocity_for(0.7 + energy_norm/30.0), 0.02))
                 else:
-                    if random.random() < 0.6:
+                    if rng.random() < 0.6:
                         events.append((st, 42, velocity_for(0.6), 0.02))
             # percussion + trance-style claps every 2 bars
-            if beat_idx % 8 == 0 and random.random() < 0.6:
+            if beat_idx % 8 == 0 and rng.random() < 0.6:
                 events.append((t + seconds_per_beat * 0.5, 39, velocity_for(0.9), 0.06))
 
     elif "industrial" in genre_key:
@@ -331,13 +650,13 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
             t = beat_idx * seconds_per_beat
             # heavy kick with random double hits
             events.append((t, 36, velocity_for(0.95, base=120), 0.12))
-            if random.random() < 0.25 * density:
+            if rng.random() < 0.25 * density:
                 events.append((t + seconds_per_beat * 0.25, 36, velocity_for(0.7), 0.07))
             # metallic hits: use tom/percussion notes (47,48,49)
-            if random.random() < 0.6 * density:
-                events.append((t + seconds_per_beat * random.random(), random.choice([47,48,49,51]), velocity_for(0.8), 0.05))
+            if rng.random() < 0.6 * density:
+                events.append((t + seconds_per_beat * rng.random(), rng.choice([47,48,49,51]), velocity_for(0.8), 0.05))
             # noisy snares/claps
-            if beat_idx % 2 == 1 and random.random() < 0.8 * density:
+            if beat_idx % 2 == 1 and rng.random() < 0.8 * density:
                 events.append((t + seconds_per_beat * 0.5, 38, velocity_for(0.95), 0.08))
 
     elif "hiphop_boom_bap" in genre_key:
@@ -346,7 +665,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
         for bar in range(bars):
             bar_start = bar * seconds_per_bar
             # Occasionally use a rim-only bar (intro/break flavor)
-            rim_only_bar = (bar % 8 == 4 and random.random() < 0.7)
+            rim_only_bar = (bar % 8 == 4 and rng.random() < 0.7)
             # Main backbeat snares on 2 and 4 (slightly late for laid-back feel)
             for sn in [1.0, 3.0]:
                 t_sn = bar_start + sn * seconds_per_beat + (0.01 if energy_norm <= 6 else 0.005)
@@ -356,17 +675,17 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                 else:
                     events.append((t_sn, 38, velocity_for(0.95, base=118), 0.08))
                     # Layer occasional clap
-                    if random.random() < 0.4:
+                    if rng.random() < 0.4:
                         events.append((t_sn, 39, velocity_for(0.7), 0.06))
                 # Ghost just before snare
-                if (not rim_only_bar) and random.random() < 0.6:
+                if (not rim_only_bar) and rng.random() < 0.6:
                     events.append((t_sn - seconds_per_beat * 0.125, 38, velocity_for(0.45, base=85), 0.03))
             
             # Kicks: boom on 1, pickup before 2, boom on 3, occasional pickup before 4
             kick_positions = [0.0, 1.75, 3.0]
-            if random.random() < 0.5:
+            if rng.random() < 0.5:
                 kick_positions.append(0.5)
-            if random.random() < 0.35:
+            if rng.random() < 0.35:
                 kick_positions.append(2.5)
             for kp in kick_positions:
                 events.append((bar_start + kp * seconds_per_beat, 36, velocity_for(0.92, base=115), 0.09))
@@ -385,23 +704,23 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                     v_hat = velocity_for(0.62)
                 events.append((t_hat, 42, v_hat, 0.03))
                 # Open hat leading into snare
-                if i in [1, 5] and random.random() < 0.35:
+                if i in [1, 5] and rng.random() < 0.35:
                     events.append((t_hat + seconds_per_beat * 0.45, 46, velocity_for(0.56), 0.08))
             # Low-energy shaker to glue groove
             if energy_norm <= 4:
                 for i in [1, 3, 5, 7]:
                     t_shk = bar_start + i * (seconds_per_bar / 8.0)
-                    if random.random() < 0.6:
+                    if rng.random() < 0.6:
                         events.append((t_shk, 82, velocity_for(0.4), 0.05))
             # Optional vinyl ticks layer
             if lofi_vinyl:
                 for i in range(16):
-                    tv = bar_start + i * (seconds_per_bar / 16.0) + random.uniform(-0.003, 0.003)
-                    if random.random() < 0.3:
+                    tv = bar_start + i * (seconds_per_bar / 16.0) + rng.uniform(-0.003, 0.003)
+                    if rng.random() < 0.3:
                         events.append((tv, 42, velocity_for(0.28, base=60, variation=6), 0.01))
             
             # Occasional rim clicks and percs
-            if random.random() < 0.3:
+            if rng.random() < 0.3:
                 events.append((bar_start + 2.25 * seconds_per_beat, 37, velocity_for(0.5), 0.03))
 
     elif "hiphop_west_coast" in genre_key:
@@ -410,7 +729,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
         for bar in range(bars):
             bar_start = bar * seconds_per_bar
             # Occasional rim-only first backbeat for arrangement flavor
-            rim_intro = (bar % 8 == 0 and random.random() < 0.5)
+            rim_intro = (bar % 8 == 0 and rng.random() < 0.5)
             # Claps/Rims on 2 and 4
             for sn in [1.0, 3.0]:
                 t_sn = bar_start + sn * seconds_per_beat + 0.008
@@ -418,16 +737,16 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                     events.append((t_sn, 37, velocity_for(0.75), 0.06))  # rim instead of clap/snare on first backbeat
                 else:
                     # Clap flam: small pre-hit before main clap for width
-                    if random.random() < 0.6:
+                    if rng.random() < 0.6:
                         events.append((t_sn - 0.012, 39, velocity_for(0.55), 0.06))
                     events.append((t_sn, 39, velocity_for(0.92, base=115), 0.08))  # clap
                     events.append((t_sn, 38, velocity_for(0.75, base=105), 0.06))  # snare layer
             
             # Kicks: 1, occasional 1.75, 3; sometimes 3.75 pickup
             kick_positions = [0.0, 3.0]
-            if random.random() < 0.45:
+            if rng.random() < 0.45:
                 kick_positions.append(1.75)
-            if random.random() < 0.3:
+            if rng.random() < 0.3:
                 kick_positions.append(3.75)
             for kp in kick_positions:
                 events.append((bar_start + kp * seconds_per_beat, 36, velocity_for(0.95, base=118), 0.1))
@@ -438,12 +757,12 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                 if i % 2 == 1:
                     t_hat += swing_8th
                 events.append((t_hat, 42, velocity_for(0.58), 0.03))
-                if random.random() < 0.2 and i in [1, 5]:
+                if rng.random() < 0.2 and i in [1, 5]:
                     events.append((t_hat + seconds_per_beat * 0.5, 46, velocity_for(0.5), 0.06))
             
             # Accent shaker on offbeats
             for i in [1, 3, 5, 7]:
-                if random.random() < 0.5:
+                if rng.random() < 0.5:
                     t_shk = bar_start + i * (seconds_per_bar / 8.0)
                     events.append((t_shk, 82, velocity_for(0.45), 0.05))  # High shaker
 
@@ -454,7 +773,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
             # syncopated hats
             if beat_idx % 2 == 0:
                 events.append((t + seconds_per_beat * 0.25, 42, velocity_for(0.6), 0.02))
-            if random.random() < 0.4 * density:
+            if rng.random() < 0.4 * density:
                 events.append((t + seconds_per_beat * 0.5, 49, velocity_for(0.7), 0.04))
 
     elif "drum_and_bass" in genre_key:
@@ -505,7 +824,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                     events.append((t, 38, snare_velocity, 0.05))
                     
                     # Add flam-like extra hit for snap (very short, slightly before)
-                    if snare_snap and random.random() < 0.7:
+                    if snare_snap and rng.random() < 0.7:
                         flam_t = t - 0.01  # 10ms before main hit
                         flam_velocity = snare_velocity * 0.7
                         events.append((flam_t, 38, int(flam_velocity), 0.02))
@@ -514,7 +833,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                 ghost_probability = 0.5 + (energy_norm * 0.05)  # 0.55 to 0.95
                 for s in sorted(snare_steps):
                     ghost_s = max(0, s - 1)
-                    if random.random() < ghost_probability:
+                    if rng.random() < ghost_probability:
                         t = bar_start + ghost_s * step_duration
                         events.append((t, 38, velocity_for(0.45, base=85), 0.03))
 
@@ -557,7 +876,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                         else:
                             v = velocity_for(0.6)
                     
-                    if random.random() < hat_density:
+                    if rng.random() < hat_density:
                         events.append((t, 42, v, 0.015))
                 
                 # Add shaker layer for break feel at higher energy
@@ -567,7 +886,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                         events.append((t, 43, velocity_for(0.4), 0.1))  # Shaker
 
                 # Bar-end snare fill every 4 bars
-                if (bar + 1) % 4 == 0 and random.random() < 0.8:
+                if (bar + 1) % 4 == 0 and rng.random() < 0.8:
                     for s in [13, 14, 15]:  # last three 16ths
                         t = bar_start + s * step_duration
                         events.append((t, 38, velocity_for(0.8), 0.03))
@@ -588,7 +907,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                 if energy_norm >= 8:
                     # Random percussion hits for variation
                     for s in [1, 5, 9, 13]:  # Off-beat 16ths
-                        if random.random() < 0.3:
+                        if rng.random() < 0.3:
                             t = bar_start + s * step_duration
                             events.append((t, 44, velocity_for(0.5), 0.04))  # Pedal hi-hat
 
@@ -613,7 +932,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                         v = velocity_for(0.58)
                     events.append((th, 42, v, 0.015))
                 # Ride at offbeats occasionally
-                if random.random() < 0.4:
+                if rng.random() < 0.4:
                     for i in (1, 3):
                         events.append((bar_start + i * seconds_per_beat, 51, velocity_for(0.6), 0.04))
                 # Crash at section start
@@ -635,7 +954,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                     v = 0.8 if s % 4 == 2 else (0.7 if s % 2 == 0 else 0.6)
                     events.append((th, 42, velocity_for(v), 0.012))
                 # Perc shots
-                if energy_norm >= 7 and random.random() < 0.6:
+                if energy_norm >= 7 and rng.random() < 0.6:
                     for s in [3, 7, 11, 15]:
                         events.append((bar_start + s * step, 44, velocity_for(0.55), 0.03))
 
@@ -647,7 +966,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                     events.append((stime, 38, velocity_for(0.9, base=112), 0.05))
                 # Ghost snares slightly before main
                 for stime in snare_times:
-                    if random.random() < 0.6:
+                    if rng.random() < 0.6:
                         events.append((stime - seconds_per_beat * 0.25, 38, velocity_for(0.45, base=85), 0.03))
                 # Kicks pattern: 1.0 and 3.5 base, variations by energy
                 kick_positions = [0.0, 3.5]
@@ -661,17 +980,17 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                 for i in range(16):
                     t_hat = bar_start + i * (seconds_per_bar / 16.0)
                     base_v = 0.65 if i % 4 != 0 else 0.75  # emphasize quarters
-                    if random.random() < 0.9:
+                    if rng.random() < 0.9:
                         events.append((t_hat, 42, velocity_for(base_v), 0.015))
                 # Rides on offbeats (liquid feel)
-                if random.random() < 0.7:
+                if rng.random() < 0.7:
                     for i in (1, 3):
                         events.append((bar_start + i * seconds_per_beat, 51, velocity_for(0.6), 0.05))  # ride
 
         # Extra ghost hits at high energy
         if energy_norm >= 8:
             for _ in range(bars):
-                t = random.uniform(0, seconds_per_bar * bars)
+                t = rng.uniform(0, seconds_per_bar * bars)
                 events.append((t, 38, velocity_for(0.4), 0.02))
 
     else:
@@ -733,7 +1052,7 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
                 for g in [0.75, 2.75]:
                     events.append((bs + g*seconds_per_beat, 38, velocity_for(0.4, base=70), 0.03))
                 # Feathered kick on 1 occasionally
-                if random.random() < 0.5:
+                if rng.random() < 0.5:
                     events.append((bs, 36, velocity_for(0.4, base=70), 0.05))
         else:
             # default generic 4/4
@@ -751,29 +1070,29 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
     if energy_norm >= 8:
         # High energy: lots of layers, fast hats, dense fills
         for _ in range(int(bars * 3)):
-            t = random.uniform(0, seconds_per_bar * bars)
+            t = rng.uniform(0, seconds_per_bar * bars)
             # More ghost notes
-            if random.random() < 0.8:
+            if rng.random() < 0.8:
                 events.append((t, 38, velocity_for(0.3), 0.02))
             else:
-                events.append((t, random.choice([47,48,49,51]), velocity_for(0.4), 0.02))
+                events.append((t, rng.choice([47,48,49,51]), velocity_for(0.4), 0.02))
         # Faster hi-hat patterns
         for beat_idx in range(total_beats * 2):  # Double the resolution
             t = beat_idx * (seconds_per_beat / 2)
-            if random.random() < 0.9:
+            if rng.random() < 0.9:
                 events.append((t, 42, velocity_for(0.7), 0.015))
     elif energy_norm >= 5:
         # Medium energy: moderate layers
         for _ in range(int(bars * 1.5)):
-            t = random.uniform(0, seconds_per_bar * bars)
-            if random.random() < 0.6:
+            t = rng.uniform(0, seconds_per_bar * bars)
+            if rng.random() < 0.6:
                 events.append((t, 38, velocity_for(0.4), 0.025))
             else:
-                events.append((t, random.choice([47,48,49]), velocity_for(0.5), 0.025))
+                events.append((t, rng.choice([47,48,49]), velocity_for(0.5), 0.025))
     elif energy_norm <= 3:
         # Low energy: lots of space, minimal elements
         # Remove some events to create space
-        events = [e for e in events if random.random() < 0.7]  # Remove 30% of events
+        events = [e for e in events if rng.random() < 0.7]  # Remove 30% of events
         # Add more space between elements
         spaced_events = []
         for i, event in enumerate(events):
@@ -788,399 +1107,2100 @@ def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset=
         events = spaced_events
 
     # Apply swing and humanization for better groove
-    events = apply_swing_and_humanization(events, genre_key, energy_norm, humanize_intensity=humanize_intensity, bpm=bpm)
+    events = apply_swing_and_humanization(events, genre_key, energy_norm, humanize_intensity=humanize_intensity, bpm=bpm, rng=rng)
     
     # Final sort by time
     events.sort(key=lambda x: x[0])
     return events
 
 
+# -------------------------
+# Step-grid drum engine (NumPy)
+# -------------------------
+# Each genre is described as a set of lanes on a 16-step grid. A lane holds a
+# per-step hit probability and velocity for one instrument; all bars are then
+# sampled in a single vectorized draw instead of one random.random() per hit.
+GRID_STEPS = 16  # 16th-note steps per 4/4 bar
+_ALL_STEPS = tuple(range(GRID_STEPS))
+_QUARTERS = (0, 4, 8, 12)
+_OFFBEATS = (2, 6, 10, 14)
+_EIGHTHS = tuple(range(0, GRID_STEPS, 2))
+
+
+def _lane(pitch, dur, steps, level=0.6, base=80, variation=12, prob=1.0, velocity=None,
+          offset=0.0, nudge=0.0, spread=None, jitter=None, dur_beats=False,
+          every=1, phases=(0,), gate=None):
+    """
+    One instrument lane on the 16-step grid: hit probability + velocity per step.
+    steps: grid steps (0..15) the lane may fire on; level/prob may be scalars or per-step sequences.
+    pitch: MIDI note, or a tuple of notes picked uniformly per hit.
+    offset: shift in beats for off-grid positions (triplets, 32nds); nudge: fixed shift in seconds.
+    spread: (lo, hi) random offset in beats; jitter: (lo, hi) random offset in seconds.
+    every/phases: only play on bars where bar % every is in phases (bar itself when every is None).
+    gate: (name, on) ties the lane to a shared per-bar coin flip from the pattern's "gates".
+    """
+    n = len(steps)
+    levels = list(level) if isinstance(level, (list, tuple)) else [level] * n
+    probs = list(prob) if isinstance(prob, (list, tuple)) else [prob] * n
+    lane_prob = np.zeros(GRID_STEPS)
+    lane_vel = np.zeros(GRID_STEPS, dtype=np.int64)
+    for s, lv, p in zip(steps, levels, probs):
+        lane_prob[s] = max(0.0, min(1.0, p))
+        lane_vel[s] = velocity if velocity is not None else velocity_for(lv, base=base, variation=variation)
+    return {
+        "pitch": pitch, "dur": dur, "dur_beats": dur_beats,
+        "prob": lane_prob, "vel": lane_vel,
+        "offset": offset, "nudge": nudge,
+        "spread": spread or (0.0, 0.0), "jitter": jitter or (0.0, 0.0),
+        "every": every, "phases": tuple(phases), "gate": gate,
+    }
+
+
+def _scatter(rate, voices):
+    """
+    Free-floating hits placed uniformly inside each bar, `rate` hits per bar on average.
+    voices: list of (weight, pitches, velocity, duration); a voice is picked per hit by weight.
+    """
+    return {"rate": rate, "voices": voices}
+
+
+def _grid_tech_house(energy_norm, density, opts):
+    return {"lanes": [
+        _lane(36, 0.1, _QUARTERS, 0.92, base=114),
+        _lane(46, 0.12, _OFFBEATS, 0.78),
+        _lane(42, 0.03, _QUARTERS, 0.62),
+        _lane(39, 0.06, (4, 12), 0.88),
+        _lane(49, 0.05, (1, 5, 9, 13), 0.55, prob=0.25),  # perc blips
+    ]}
+
+
+def _grid_deep_house(energy_norm, density, opts):
+    return {"lanes": [
+        _lane(36, 0.1, _QUARTERS, 0.88, base=108),
+        _lane(46, 0.1, _OFFBEATS, 0.7),
+        _lane(39, 0.06, (4, 12), 0.78),
+        _lane(51, 0.08, (3, 7, 11, 15), 0.55, prob=0.15),  # ride
+    ]}
+
+
+def _grid_uk_garage(energy_norm, density, opts):
+    hat_levels = [0.72 if s % 4 == 2 else (0.6 if s % 2 == 0 else 0.5) for s in _ALL_STEPS]
+    return {"lanes": [
+        _lane(36, 0.08, (0, 10), 0.9),
+        _lane(39, 0.06, (4, 12), 0.85),
+        _lane(42, 0.02, _ALL_STEPS, hat_levels, prob=0.9),
+    ]}
+
+
+def _grid_house(energy_norm, density, opts):
+    pattern = {"lanes": [
+        _lane(36, 0.1, _QUARTERS, 0.9, base=112),
+        _lane(42, 0.03, _QUARTERS, 0.6),
+        _lane(46, 0.12, _OFFBEATS, 0.75),
+        _lane(39, 0.06, (4, 12), 0.85),
+    ]}
+    if energy_norm >= 6:
+        pattern["scatter"] = [_scatter(1, [(1.0, (42,), velocity_for(0.6), 0.02)])]
+    return pattern
+
+
+def _grid_reggaeton_dembow(energy_norm, density, opts):
+    return {"lanes": [
+        _lane(36, 0.08, (0, 10), 0.9, base=110),
+        _lane(39, 0.07, (7, 14), 0.9),
+        _lane(42, 0.03, _EIGHTHS, 0.58),
+        _lane(82, 0.05, _OFFBEATS, 0.45, nudge=0.01, gate=("shaker", True)),
+    ], "gates": {"shaker": (0.5, 1, (0,))}}
+
+
+def _grid_techno(energy_norm, density, opts, is_peak=False, is_acid=False):
+    lanes = [
+        _lane(36, 0.1, _QUARTERS, 0.97 if is_peak else 0.95, base=116 if is_peak else 114),
+        _lane(42, 0.02, _QUARTERS, 0.5),
+        _lane(46, 0.12, _OFFBEATS, 0.82 if is_peak else 0.78),
+    ]
+    # Clap on 2 & 4 for peak techno; sparser for standard/acid
+    if is_peak and energy_norm >= 5:
+        lanes.append(_lane(39, 0.05, (4, 12), 0.78))
+    else:
+        lanes.append(_lane(39, 0.05, (4, 12), 0.68, prob=0.35))
+    # Metallic ticks slightly after the kick on beats 1 and 3
+    lanes.append(_lane(49, 0.04, (1, 9), 0.52, prob=0.35 if is_peak else 0.25))
+    if is_peak:
+        lanes.append(_lane(51, 0.04, (3, 7, 11, 15), 0.5, prob=0.15))
+    if is_acid:
+        # Extra 32nd off-hat in the last quarter of each beat
+        lanes.append(_lane(42, 0.015, (3, 7, 11, 15), 0.58, prob=0.5, offset=0.125))
+    if energy_norm >= 7:
+        lanes.append(_lane(49, 0.4, (0,), 0.85, every=None))  # crash at section start
+    return {"lanes": lanes}
+
+
+def _grid_trance(energy_norm, density, opts):
+    main = 0.7 + energy_norm / 30.0
+    lanes = [_lane(36, 0.1, _QUARTERS, 1.0, base=115)]
+    if energy_norm < 6:
+        lanes.append(_lane(42, 0.02, _EIGHTHS, main))
+        lanes.append(_lane(42, 0.02, tuple(range(1, GRID_STEPS, 2)), 0.6, prob=0.6))
+    else:
+        lanes.append(_lane(42, 0.02, _ALL_STEPS, main))
+        lanes.append(_lane(42, 0.02, _ALL_STEPS, 0.6, prob=0.6, offset=0.125))
+    lanes.append(_lane(39, 0.06, (2,), 0.9, prob=0.6, every=2))  # clap every 2 bars
+    return {"lanes": lanes}
+
+
+def _grid_industrial(energy_norm, density, opts):
+    return {"lanes": [
+        _lane(36, 0.12, _QUARTERS, 0.95, base=120),
+        _lane(36, 0.07, (1, 5, 9, 13), 0.7, prob=0.25 * density),  # double hits
+        _lane((47, 48, 49, 51), 0.05, _QUARTERS, 0.8, prob=0.6 * density, spread=(0.0, 1.0)),
+        _lane(38, 0.08, (6, 14), 0.95, prob=0.8 * density),
+    ]}
+
+
+def _grid_hiphop_boom_bap(energy_norm, density, opts):
+    swing_8th = 0.04  # laid back
+    late = 0.01 if energy_norm <= 6 else 0.005
+    lanes = [
+        # Backbeat on 2 and 4, or a rim click on rim-only bars
+        _lane(37, 0.06, (4, 12), 0.7, nudge=late, gate=("rim", True)),
+        _lane(38, 0.08, (4, 12), 0.95, base=118, nudge=late, gate=("rim", False)),
+        _lane(39, 0.06, (4, 12), 0.7, prob=0.4, nudge=late, gate=("rim", False)),
+        _lane(38, 0.03, (4, 12), 0.45, base=85, prob=0.6, offset=-0.125, nudge=late, gate=("rim", False)),
+        # Kicks: boom on 1, pickup before 2, boom on 3, optional 0.5 / 2.5
+        _lane(36, 0.09, (0, 2, 7, 10, 12), 0.92, base=115, prob=[1.0, 0.5, 1.0, 0.35, 1.0]),
+        # Swung 8th hats, accented offbeats before the snares
+        _lane(42, 0.03, _QUARTERS, 0.6),
+        _lane(42, 0.03, _OFFBEATS, [0.68, 0.62, 0.68, 0.62], nudge=swing_8th),
+        _lane(46, 0.08, (2, 10), 0.56, prob=0.35, offset=0.45, nudge=swing_8th),
+        _lane(37, 0.03, (9,), 0.5, prob=0.3),
+    ]
+    if energy_norm <= 4:
+        lanes.append(_lane(82, 0.05, _OFFBEATS, 0.4, prob=0.6))
+    if opts.get("lofi_vinyl"):
+        lanes.append(_lane(42, 0.01, _ALL_STEPS, 0.28, base=60, variation=6, prob=0.3, jitter=(-0.003, 0.003)))
+    return {"lanes": lanes, "gates": {"rim": (0.7, 8, (4,))}}
+
+
+def _grid_hiphop_west_coast(energy_norm, density, opts):
+    swing_8th = 0.03
+    late = 0.008
+    return {"lanes": [
+        # First backbeat: rim on intro bars, otherwise clap flam + clap + snare
+        _lane(37, 0.06, (4,), 0.75, nudge=late, gate=("rim_intro", True)),
+        _lane(39, 0.06, (4,), 0.55, prob=0.6, nudge=late - 0.012, gate=("rim_intro", False)),
+        _lane(39, 0.08, (4,), 0.92, base=115, nudge=late, gate=("rim_intro", False)),
+        _lane(38, 0.06, (4,), 0.75, base=105, nudge=late, gate=("rim_intro", False)),
+        _lane(39, 0.06, (12,), 0.55, prob=0.6, nudge=late - 0.012),
+        _lane(39, 0.08, (12,), 0.92, base=115, nudge=late),
+        _lane(38, 0.06, (12,), 0.75, base=105, nudge=late),
+        # Kicks: 1 and 3, optional 1.75 and 3.75 pickups
+        _lane(36, 0.1, (0, 7, 12, 15), 0.95, base=118, prob=[1.0, 0.45, 1.0, 0.3]),
+        _lane(42, 0.03, _QUARTERS, 0.58),
+        _lane(42, 0.03, _OFFBEATS, 0.58, nudge=swing_8th),
+        _lane(46, 0.06, (2, 10), 0.5, prob=0.2, offset=0.5, nudge=swing_8th),
+        _lane(82, 0.05, _OFFBEATS, 0.45, prob=0.5),
+    ], "gates": {"rim_intro": (0.5, 8, (0,))}}
+
+
+def _grid_hiphop_trap(energy_norm, density, opts):
+    # Half-time trap: snare/clap on 3, sparse 808 kicks, 8th hats with 16th/32nd rolls
+    lanes = [
+        _lane(36, 0.12, (0, 3, 7, 10, 14), 0.95, base=118, prob=[1.0, 0.3, 0.35, 1.0, 0.25]),
+        _lane(38, 0.08, (8,), 0.95, base=116),
+        _lane(39, 0.06, (8,), 0.8, prob=0.5),
+        _lane(42, 0.02, _EIGHTHS, 0.62),
+        _lane(42, 0.015, tuple(range(1, GRID_STEPS, 2)), 0.5, prob=0.3 + energy_norm * 0.03),
+        _lane(46, 0.08, (14,), 0.55, prob=0.2),
+    ]
+    if energy_norm >= 6:
+        # 32nd hat roll leading into the next bar
+        lanes.append(_lane(42, 0.01, (12, 13, 14, 15), 0.55, offset=0.125, gate=("roll", True)))
+    return {"lanes": lanes, "gates": {"roll": (0.5, 1, (0,))}}
+
+
+def _grid_ebm(energy_norm, density, opts):
+    return {"lanes": [
+        _lane(36, 0.09, _QUARTERS, 0.95),
+        _lane(42, 0.02, (1, 9), 0.6),
+        _lane(49, 0.04, _OFFBEATS, 0.7, prob=0.4 * density),
+    ]}
+
+
+def _dnb_hat_levels(hat_layout):
+    levels = []
+    for s in _ALL_STEPS:
+        if hat_layout == "break":
+            levels.append(0.85 if s % 4 == 2 else (0.75 if s % 4 == 0 else 0.55))
+        elif hat_layout == "sparse":
+            levels.append(0.8 if s % 4 == 0 else (0.6 if s % 4 == 2 else None))
+        else:
+            levels.append(0.8 if s % 4 == 0 else (0.7 if s % 2 == 0 else 0.6))
+    return levels
+
+
+def _grid_drum_and_bass_classic(energy_norm, density, opts):
+    break_preset = opts.get("break_preset", "amen")
+    snare_snap = opts.get("snare_snap", False)
+    hat_layout = opts.get("hat_layout", "standard")
+    if break_preset == "think":
+        kick_steps = {0, 4, 8, 12}
+    elif break_preset == "tight":
+        kick_steps = {0, 2, 8, 10}
+    else:
+        kick_steps = {0, 6, 8, 15}
+    if energy_norm >= 7:
+        kick_steps.add(6 if break_preset == "think" else 10)
+    if energy_norm >= 9:
+        kick_steps.add(14)
+    snare_velocity = velocity_for(0.98, base=120) if snare_snap else velocity_for(0.95, base=115)
+
+    hat_levels = _dnb_hat_levels(hat_layout)
+    hat_steps = tuple(s for s in _ALL_STEPS if hat_levels[s] is not None)
+    lanes = [
+        _lane(36, 0.04, tuple(sorted(kick_steps)), 0.92, base=118),
+        _lane(38, 0.05, (4, 12), velocity=snare_velocity),
+        _lane(38, 0.03, (3, 11), 0.45, base=85, prob=0.5 + energy_norm * 0.05),  # ghosts
+        _lane(42, 0.015, hat_steps, [hat_levels[s] for s in hat_steps], prob=0.85 + energy_norm * 0.01),
+        _lane(38, 0.03, (13, 14, 15), 0.8, gate=("fill", True)),  # bar-end fill every 4 bars
+    ]
+    if snare_snap:
+        lanes.append(_lane(38, 0.02, (4, 12), velocity=int(snare_velocity * 0.7), prob=0.7, nudge=-0.01))
+    if energy_norm >= 6 and hat_layout == "break":
+        lanes.append(_lane(43, 0.1, _QUARTERS, 0.4))  # shaker
+    if energy_norm >= 7:
+        lanes.append(_lane(49, 0.5, (0,), 0.9, every=None))  # crash on bar 1
+    if energy_norm >= 8:
+        lanes.append(_lane(57, 0.2, (15,), 0.7, every=None, phases=(3,)))  # impact into bar 5
+        lanes.append(_lane(44, 0.04, (1, 5, 9, 13), 0.5, prob=0.3))
+    return {"lanes": lanes, "gates": {"fill": (0.8, 4, (3,))}}
+
+
+def _grid_drum_and_bass_stepper(energy_norm, density, opts):
+    lanes = [
+        _lane(38, 0.05, (4, 12), 0.96, base=118),
+        _lane(36, 0.05, (0, 7, 13), 0.94, base=118),
+        _lane(42, 0.015, _ALL_STEPS, [0.78 if s % 4 == 0 else (0.68 if s % 2 == 0 else 0.58) for s in _ALL_STEPS]),
+        _lane(51, 0.04, (4, 12), 0.6, gate=("ride", True)),
+    ]
+    if energy_norm >= 7:
+        lanes.append(_lane(49, 0.4, (0,), 0.9, every=None))
+    return {"lanes": lanes, "gates": {"ride": (0.4, 1, (0,))}}
+
+
+def _grid_drum_and_bass_neuro(energy_norm, density, opts):
+    lanes = [
+        _lane(38, 0.05, (4, 12), 0.97, base=120),
+        _lane(36, 0.045, (0, 9, 14), 0.95, base=120),
+        _lane(42, 0.012, _ALL_STEPS, [0.8 if s % 4 == 2 else (0.7 if s % 2 == 0 else 0.6) for s in _ALL_STEPS]),
+    ]
+    if energy_norm >= 7:
+        lanes.append(_lane(44, 0.03, (3, 7, 11, 15), 0.55, gate=("shots", True)))
+    return {"lanes": lanes, "gates": {"shots": (0.6, 1, (0,))}}
+
+
+def _grid_drum_and_bass_liquid(energy_norm, density, opts):
+    kick_steps = [0, 14]
+    if energy_norm >= 6:
+        kick_steps.append(6)
+    if energy_norm >= 8:
+        kick_steps.append(9)
+    return {"lanes": [
+        _lane(38, 0.05, (4, 12), 0.9, base=112),
+        _lane(38, 0.03, (3, 11), 0.45, base=85, prob=0.6),
+        _lane(36, 0.04, tuple(sorted(kick_steps)), 0.9, base=115),
+        _lane(42, 0.015, _ALL_STEPS, [0.75 if s % 4 == 0 else 0.65 for s in _ALL_STEPS], prob=0.9),
+        _lane(51, 0.05, (4, 12), 0.6, gate=("ride", True)),
+    ], "gates": {"ride": (0.7, 1, (0,))}}
+
+
+def _grid_pop(energy_norm, density, opts):
+    return {"lanes": [
+        _lane(36, 0.08, (0, 8), 0.88),
+        _lane(38, 0.08, (4, 12), 0.9),
+        _lane(42, 0.02, _EIGHTHS, 0.6),
+    ]}
+
+
+def _grid_rock(energy_norm, density, opts):
+    return {"lanes": [
+        _lane(36, 0.1, (0, 8), 0.95, base=118),
+        _lane(38, 0.09, (4, 12), 0.92, base=116),
+        # 8th hats for the first half of each 8-bar phrase, ride for the second
+        _lane(42, 0.03, _EIGHTHS, 0.62, every=8, phases=(0, 1, 2, 3)),
+        _lane(51, 0.05, _EIGHTHS, 0.6, every=8, phases=(4, 5, 6, 7)),
+        _lane(49, 0.5, (0,), 0.9, every=2),
+    ]}
+
+
+def _grid_afrobeat(energy_norm, density, opts):
+    return {"lanes": [
+        _lane(39, 0.06, (4, 12), 0.75),
+        _lane(36, 0.08, (0, 6, 11), 0.88),
+        _lane(42, 0.04, _QUARTERS, 0.55),
+        _lane(82, 0.04, _OFFBEATS, 0.55, nudge=0.01),
+    ]}
+
+
+def _grid_jazz_swing(energy_norm, density, opts):
+    return {"lanes": [
+        _lane(51, 0.1, _QUARTERS, 0.6, dur_beats=True),
+        _lane(51, 0.08, _QUARTERS, 0.5, offset=2 / 3.0, dur_beats=True),  # triplet skip
+        _lane(42, 0.04, (4, 12), 0.65),
+        _lane(38, 0.03, (3, 11), 0.4, base=70),
+        _lane(36, 0.05, (0,), 0.4, base=70, prob=0.5),
+    ]}
+
+
+def _grid_default(energy_norm, density, opts):
+    return {"lanes": [
+        _lane(36, 0.08, _QUARTERS, 0.9),
+        _lane(38, 0.07, (4, 12), 0.85),
+        _lane(42, 0.02, _EIGHTHS, 0.6),
+    ]}
+
+
+def _add_energy_layers(pattern, family, energy_norm):
+    """Genre-independent energy scaling, mirroring the tail of the legacy generator."""
+    lanes = list(pattern["lanes"])
+    scatter = list(pattern.get("scatter", []))
+    if family == "drum_and_bass" and energy_norm >= 8:
+        scatter.append(_scatter(1, [(1.0, (38,), velocity_for(0.4), 0.02)]))
+    if energy_norm >= 8:
+        # High energy: ghost notes / tom hits plus double-time hats
+        scatter.append(_scatter(3, [(0.8, (38,), velocity_for(0.3), 0.02),
+                                    (0.2, (47, 48, 49, 51), velocity_for(0.4), 0.02)]))
+        lanes.append(_lane(42, 0.015, _EIGHTHS, 0.7, prob=0.9))
+    elif energy_norm >= 5:
+        scatter.append(_scatter(1.5, [(0.6, (38,), velocity_for(0.4), 0.025),
+                                      (0.4, (47, 48, 49), velocity_for(0.5), 0.025)]))
+    elif energy_norm <= 3:
+        # Low energy: thin out ~30% of hits and space repeated instruments
+        for lane in lanes:
+            lane["prob"] = lane["prob"] * 0.7
+    return dict(pattern, lanes=lanes, scatter=scatter, space=energy_norm <= 3)
+
+
+def _compile_drum_grid(pattern):
+    """
+    Flatten a lane pattern into per-slot arrays (one slot per lane step that can fire).
+    Positions, offsets and durations are converted to ticks here, once per pattern.
+    """
+    gate_names = sorted(pattern.get("gates", {}))
+    slots = {k: [] for k in ("pos", "prob", "vel", "pitch", "choice", "dur",
+                             "offset_lo", "offset_w", "lane")}
+    choices = []
+    lane_bars = []
+    for li, lane in enumerate(pattern["lanes"]):
+        if isinstance(lane["pitch"], tuple):
+            choice_id, pitch = len(choices), 0
+            choices.append(lane["pitch"])
+        else:
+            choice_id, pitch = -1, lane["pitch"]
+        gate = lane["gate"]
+        lane_bars.append((lane["every"], lane["phases"],
+                          (gate_names.index(gate[0]), gate[1]) if gate else None))
+        dur = lane["dur"] * (PPQ if lane["dur_beats"] else _REF_TICKS_PER_SECOND)
+        offset_lo = lane["spread"][0] * PPQ + lane["jitter"][0] * _REF_TICKS_PER_SECOND
+        offset_w = ((lane["spread"][1] - lane["spread"][0]) * PPQ
+                    + (lane["jitter"][1] - lane["jitter"][0]) * _REF_TICKS_PER_SECOND)
+        for s in np.flatnonzero(lane["prob"] > 0):
+            slots["pos"].append((s / 4.0 + lane["offset"]) * PPQ + lane["nudge"] * _REF_TICKS_PER_SECOND)
+            slots["prob"].append(lane["prob"][s])
+            slots["vel"].append(lane["vel"][s])
+            slots["pitch"].append(pitch)
+            slots["choice"].append(choice_id)
+            slots["dur"].append(dur)
+            slots["offset_lo"].append(offset_lo)
+            slots["offset_w"].append(offset_w)
+            slots["lane"].append(li)
+    grid = {k: np.asarray(v, dtype=np.int64 if k in ("vel", "pitch", "choice", "lane") else np.float64)
+            for k, v in slots.items()}
+
+    max_choices = max([len(c) for c in choices] + [1])
+    grid["choice_table"] = np.array([list(c) + [0] * (max_choices - len(c)) for c in choices] or [[0]], dtype=np.int64)
+    grid["choice_len"] = np.array([len(c) for c in choices] or [1], dtype=np.int64)
+    grid["lane_bars"] = lane_bars
+    grid["gates"] = [pattern["gates"][name] for name in gate_names]
+    grid["scatter"] = [dict(sc, kmax=int(math.ceil(sc["rate"])),
+                            voices=[(w, p, v, d * _REF_TICKS_PER_SECOND) for w, p, v, d in sc["voices"]])
+                       for sc in pattern.get("scatter", [])]
+    grid["space"] = pattern.get("space", False)
+    grid["width"] = 3 * len(grid["pos"]) + len(grid["gates"]) + sum(3 * sc["kmax"] for sc in grid["scatter"])
+    return grid
+
+
+def _bar_mask(bar_idx, every, phases):
+    """Boolean mask of the bars in bar_idx that a lane/gate plays on."""
+    if every == 1:
+        return np.ones(len(bar_idx), dtype=bool)
+    pos = bar_idx % every if every else bar_idx
+    return (pos[:, None] == np.asarray(phases)).any(axis=1)
+
+
+def _sample_drum_grid(grid, bar_idx, key):
+    """
+    Sample the bars in bar_idx (ascending) of a compiled grid in one vectorized draw.
+    Every bar reads a fixed-width row of counter-based uniforms (hits, offsets, pitch
+    choices, gates, scatter) addressed by (key, bar, column).
+    Returns (EventBlock, bar, column): events grouped by bar (unsorted within a bar),
+    with the bar and a per-bar unique column id of every event.
+    """
+    n = len(grid["pos"])
+    bars = len(bar_idx)
+    bar_ticks = bar_idx * (4 * PPQ)
+    u = _counter_uniforms(key, bar_idx[:, None], _STREAM_GRID, np.arange(grid["width"])[None, :])
+    u_hit, u_aux, u_choice = u[:, :n], u[:, n:2 * n], u[:, 2 * n:3 * n]
+    col = 3 * n
+
+    # Per-bar lane activity: bar masks and shared gates
+    gate_on = []
+    for prob, every, phases in grid["gates"]:
+        gate_on.append(_bar_mask(bar_idx, every, phases) & (u[:, col] < prob))
+        col += 1
+    lane_ok = np.ones((bars, len(grid["lane_bars"])), dtype=bool)
+    for li, (every, phases, gate) in enumerate(grid["lane_bars"]):
+        ok = _bar_mask(bar_idx, every, phases)
+        if gate is not None:
+            ok = ok & (gate_on[gate[0]] == gate[1])
+        lane_ok[:, li] = ok
+
+    hit = (u_hit < grid["prob"]) & lane_ok[:, grid["lane"]]
+    b, s = np.nonzero(hit)
+    tick = bar_ticks[b] + grid["pos"][s] + grid["offset_lo"][s] + u_aux[b, s] * grid["offset_w"][s]
+    pitch = grid["pitch"][s]
+    cid = grid["choice"][s]
+    picked = cid >= 0
+    if picked.any():
+        c = cid[picked]
+        pick = (u_choice[b[picked], s[picked]] * grid["choice_len"][c]).astype(np.int64)
+        pitch = pitch.copy()
+        pitch[picked] = grid["choice_table"][c, pick]
+    vel = grid["vel"][s]
+    dur = grid["dur"][s]
+
+    if grid["space"] and len(pitch) > 1:
+        # Add a small gap when an instrument repeats the previous hit's instrument (within a bar)
+        repeat = np.r_[False, (pitch[1:] == pitch[:-1]) & (b[1:] == b[:-1])]
+        tick = tick + (0.02 * _REF_TICKS_PER_SECOND) * repeat
+
+    parts = [(tick, pitch, vel, dur, b, s)]
+    for sc in grid["scatter"]:
+        k = sc["kmax"]
+        u_t, u_v, u_c = u[:, col:col + k], u[:, col + k:col + 2 * k], u[:, col + 2 * k:col + 3 * k]
+        sc_col = col
+        col += 3 * k
+        rate = sc["rate"]
+        per_bar = np.floor(rate * (bar_idx + 1)) - np.floor(rate * bar_idx)
+        bb, kk = np.nonzero(np.arange(k) < per_bar[:, None])
+        weights = np.array([v[0] for v in sc["voices"]], dtype=np.float64)
+        voice = np.minimum(np.searchsorted(np.cumsum(weights) / weights.sum(), u_v[bb, kk], side="right"),
+                           len(weights) - 1)
+        sc_pitch = np.empty(len(bb), dtype=np.int64)
+        sc_vel = np.empty(len(bb), dtype=np.int64)
+        sc_dur = np.empty(len(bb), dtype=np.float64)
+        for vi, (_, pitches, v, d) in enumerate(sc["voices"]):
+            m = voice == vi
+            pick = (u_c[bb[m], kk[m]] * len(pitches)).astype(np.int64)
+            sc_pitch[m] = np.asarray(pitches, dtype=np.int64)[pick]
+            sc_vel[m] = v
+            sc_dur[m] = d
+        parts.append((bar_ticks[bb] + u_t[bb, kk] * (4 * PPQ), sc_pitch, sc_vel, sc_dur, bb, sc_col + kk))
+    tick, pitch, vel, dur, bar, column = (np.concatenate(arrs) for arrs in zip(*parts))
+    order = np.argsort(bar, kind="stable")  # bar-major, so any bar range sorts the same way
+    block = EventBlock(np.maximum(0, np.rint(tick)), pitch, vel, np.maximum(1, np.rint(dur)))
+    return block[order], bar_idx[bar[order]], column[order]
+
+
+_DRUM_GRID_CACHE = {}
+
+def _drum_grid(genre_key, energy_norm, break_preset="amen", snare_snap=False, hat_layout="standard", lofi_vinyl=False):
+    """Build (once) and return the compiled grid for a genre/energy/options combination."""
+    profile = genre_profile(genre_key)
+    key = (profile["key"], energy_norm, break_preset, bool(snare_snap), hat_layout, bool(lofi_vinyl))
+    grid = _DRUM_GRID_CACHE.get(key)
+    if grid is None:
+        density = 0.5 + (energy_norm / 20.0)
+        opts = {"break_preset": break_preset, "snare_snap": snare_snap,
+                "hat_layout": hat_layout, "lofi_vinyl": lofi_vinyl}
+        pattern = profile["drums"](energy_norm, density, opts)
+        grid = _compile_drum_grid(_add_energy_layers(pattern, profile["family"], energy_norm))
+        _DRUM_GRID_CACHE[key] = grid
+    return grid
+
+
+def generate_drum_events(genre, bpm, energy=5, bars=8, swing=0.06, break_preset="amen", snare_snap=False, hat_layout="standard", humanize_intensity=0.6, lofi_vinyl=False, engine="grid", rng=None, first_bar=0, with_groove=False):
+    """
+    Generate drum events as an EventBlock on the tempo-free tick timeline (PPQ ticks per beat).
+    bpm is only used by the legacy engine, which works in seconds.
+    energy: 1..10 controlling density and extra hits, or a per-bar sequence of levels
+            (an energy curve, e.g. ramping across a build; the last level holds past its end)
+    engine: "grid" samples the NumPy step-grid patterns for all bars at once;
+            "legacy" runs the original per-hit generator (kept for comparison).
+    rng: int seed, random.Random or numpy Generator (fresh entropy if None).
+    first_bar: start of the bar range (grid engine); with an int seed, bars
+               first_bar..first_bar+bars match the same bars of any longer render.
+    with_groove: also return the groove context (grid engine) to pass to
+                 generate_bass_events / generate_melody_events: (events, groove).
+    """
+    if engine == "legacy":
+        events = _generate_drum_events_legacy(genre, bpm, energy=energy, bars=bars, swing=swing,
+                                              break_preset=break_preset, snare_snap=snare_snap,
+                                              hat_layout=hat_layout, humanize_intensity=humanize_intensity,
+                                              lofi_vinyl=lofi_vinyl, rng=rng)
+        return EventBlock.from_tuples(events, bpm)
+
+    setup = _drum_setup(genre, energy, bars, break_preset, snare_snap, hat_layout, humanize_intensity, lofi_vinyl)
+    return _sample_drums(setup, track_key(rng, "drums"), first_bar, with_groove=with_groove)
+
+
+def _drum_setup(genre, energy=5, bars=8, break_preset="amen", snare_snap=False, hat_layout="standard", humanize_intensity=0.6, lofi_vinyl=False):
+    """Deterministic drum inputs (genre key, energy, compiled grid per energy level) shared across variations."""
+    genre_key = _genre_key(genre)
+    energy_norm = _energy_levels(energy)
+    levels = np.unique(energy_norm).tolist() if np.ndim(energy_norm) else [energy_norm]
+    return {
+        "genre_key": genre_key, "energy_norm": energy_norm, "bars": bars,
+        "humanize_intensity": humanize_intensity,
+        "grids": {level: _drum_grid(genre_key, level, break_preset, snare_snap, hat_layout, lofi_vinyl) for level in levels},
+    }
+
+
+def _sample_drums(setup, key, first_bar=0, bars=None, with_groove=False):
+    """
+    Stochastic drum layer: sample the compiled grid (all bars, or a bar range) and humanize it.
+    with_groove=True returns (events, groove context) for the other tracks to lock to.
+    """
+    return _humanize_drums(setup, _quantize_drums(setup, key, first_bar, bars), with_groove=with_groove)
+
+
+def _quantize_drums(setup, key, first_bar=0, bars=None):
+    """Quantized drum layer: the sampled grid (bar-major, with each hit's bar) and its humanize draws."""
+    bars = setup["bars"] if bars is None else bars
+    bar_idx = np.arange(first_bar, first_bar + bars)
+    if len(setup["grids"]) == 1:
+        events, bar, column = _sample_drum_grid(next(iter(setup["grids"].values())), bar_idx, key)
+    else:
+        # Energy curve: each level's grid plays the bars at that level
+        level = _energy_at(setup["energy_norm"], bar_idx)
+        parts = [_sample_drum_grid(grid, bar_idx[level == lv], key) for lv, grid in setup["grids"].items()]
+        order = np.argsort(np.concatenate([part[1] for part in parts]), kind="stable")
+        events = EventBlock.concatenate([part[0] for part in parts])[order]
+        bar, column = (np.concatenate([part[i] for part in parts])[order] for i in (1, 2))
+    uniforms = (_counter_uniforms(key, bar, _STREAM_HUMANIZE, 2 * column),
+                _counter_uniforms(key, bar, _STREAM_HUMANIZE, 2 * column + 1))
+    return {"events": events, "bar": bar, "uniforms": uniforms, "first_bar": first_bar, "bars": bars}
+
+
+def _humanize_drums(setup, quantized, humanize_intensity=None, with_groove=False):
+    """Swing + humanization stage of a quantized drum layer (setup's intensity unless given)."""
+    if humanize_intensity is None:
+        humanize_intensity = setup["humanize_intensity"]
+    # Apply swing and humanization for better groove
+    events = apply_swing_and_humanization(quantized["events"], setup["genre_key"],
+                                          _energy_at(setup["energy_norm"], quantized["bar"]),
+                                          humanize_intensity=humanize_intensity, uniforms=quantized["uniforms"])
+    order = np.argsort(events.tick, kind="stable")
+    if with_groove:
+        groove = _groove_context(events[order], quantized["bar"][order], setup, quantized["first_bar"], quantized["bars"])
+        return events[order], groove
+    return events[order]
+
+
+# -------------------------
+# Groove context (drums -> bass and melody)
+# -------------------------
+# The drum stage describes what it actually played so bass and melody lock to it
+# instead of re-deriving their own idea of the kick pattern.
+KICK_PITCHES = (35, 36)
+SNARE_PITCHES = (38, 39, 40)
+
+
+def _swing_map(genre_key, swing_amount=0.06):
+    """Tick shift applied to each of the 16 steps of a bar (off-16ths swing later)."""
+    swing = np.zeros(GRID_STEPS)
+    swing[1::2] = swing_amount * genre_profile(genre_key)["swing"][0] * PPQ
+    return swing
+
+
+def _groove_context(events, bar, setup, first_bar, bars):
+    """
+    Groove of a sorted drum block over a bar range: kick and snare onsets (sorted ticks,
+    plus the bar each hit belongs to), the swing map and the per-bar energy profile.
+    """
+    kick = np.isin(events.pitch, KICK_PITCHES)
+    snare = np.isin(events.pitch, SNARE_PITCHES)
+    return {
+        "first_bar": first_bar,
+        "bars": bars,
+        "kick_tick": events.tick[kick],
+        "kick_bar": bar[kick],
+        "snare_tick": events.tick[snare],
+        "snare_bar": bar[snare],
+        "swing": _swing_map(setup["genre_key"]),
+        "energy": _bar_energies(setup["energy_norm"], first_bar, bars),
+    }
+
+
+def _groove_onsets(groove, name, first_bar, bars):
+    """Per-bar lists of a groove's `name` ("kick" or "snare") onset ticks for a bar range."""
+    order = np.argsort(groove[name + "_bar"], kind="stable")
+    ticks = groove[name + "_tick"][order].tolist()
+    bounds = np.searchsorted(groove[name + "_bar"][order], np.arange(first_bar, first_bar + bars + 1)).tolist()
+    return [ticks[lo:hi] for lo, hi in zip(bounds[:-1], bounds[1:])]
+
+
+def _apply_swing_map(events, swing):
+    """Shift events by the swing of the 16th step they fall in."""
+    step = (events.tick % (4 * PPQ)) // (PPQ // 4)
+    return EventBlock(events.tick + np.rint(swing[step]), events.pitch, events.vel, events.dur)
+
+
 # -------------------------
 # Bassline generation (OVERHAULED)
 # -------------------------
-def generate_bass_events(genre, bpm, energy=5, bars=8, mood="neutral", humanize_intensity=0.6):
+def _scale_for(profile, mood):
+    """Scale name from the genre profile and mood (locked genres ignore the mood)."""
+    mood = (mood or "").lower()
+    if profile["scale"]:
+        return profile["scale"]
+    if "dark" in mood:
+        return "aeolian"
+    if "uplifting" in mood:
+        return "major"
+    return profile["default_scale"]
+
+
+def generate_bass_events(genre, bpm, energy=5, bars=8, mood="neutral", humanize_intensity=0.6, rng=None, first_bar=0, groove=None):
     """
-    Generate bass events: returns list of (time, midi_note, velocity, duration)
+    Generate bass events as an EventBlock on the tempo-free tick timeline
+    (bpm is accepted for API compatibility; tempo is applied at export).
+    energy: 1..10 or a per-bar energy curve (see generate_drum_events).
+    rng: int seed, random.Random or numpy Generator (fresh entropy if None).
+    first_bar: start of the bar range (see generate_drum_events).
+    groove: groove context of the drums (generate_drum_events(with_groove=True)) covering
+            these bars; the bass then follows the kicks actually played. Without it the
+            genre's nominal kick lattice is used.
     Enhanced for better musical cohesion with drums and genre-appropriate patterns.
     """
-    beats_per_bar = 4
-    seconds_per_beat = 60.0 / bpm
-    seconds_per_bar = seconds_per_beat * beats_per_bar
+    setup = _bass_setup(genre, energy, bars, mood, humanize_intensity)
+    return _sample_bass(setup, track_key(rng, "bass"), first_bar, groove=groove)
+
 
+def _bass_setup(genre, energy=5, bars=8, mood="neutral", humanize_intensity=0.6):
+    """Deterministic bass inputs shared across variations: profile, scale, kick lattice, note shape."""
     genre_key = _genre_key(genre)
-    root = pick_genre_root(genre_key)
-    energy_norm = (energy - 1) / 9.0  # normalize to 0-1
-    
-    # Choose scale based on mood and genre - more sophisticated mapping
-    if "dark" in mood.lower() or "industrial" in genre_key or "hard" in genre_key:
-        scale_name = "phrygian" if "industrial" in genre_key else "aeolian"
-    elif "uplifting" in mood.lower() or "trance" in genre_key:
-        scale_name = "major"
-    else:
-        scale_name = "minor"
-    
+    profile = genre_profile(genre_key)
+    bass = profile["bass"]
+    energy_norm = _energy_levels(energy)
+    return {
+        "genre_key": genre_key, "energy_norm": energy_norm, "bars": bars,
+        "humanize_intensity": humanize_intensity,
+        "root": profile["root"],
+        "pools": profile["bass_pools"],
+        # Choose scale based on mood and genre - more sophisticated mapping
+        "scale_name": _scale_for(profile, mood),
+        # Kick lattice: the fixed kick positions repeated in every bar, plus those unlocked by energy
+        "kicks": [pos * PPQ for pos in bass["kicks"]],
+        "energy_kicks": [(pos * PPQ, min_energy) for pos, min_energy in bass["energy_kicks"]],
+        "chance_kicks": [(pos * PPQ, prob) for pos, prob in bass["chance_kicks"]],
+        # Duration based on energy and genre: (beats at normal energy, beats above threshold, threshold)
+        "dur": bass["dur"],
+        # Velocity dynamics: (normal, above energy 7)
+        "vel": (velocity_for(0.8, base=bass["vel_base"], variation=10),
+                velocity_for(0.8, base=bass["vel_base"], variation=15)),
+    }
+
+
+def _bass_notes_pool(setup, rng):
+    """Pick the note pool of a bassline (drawn once per line, not per bar)."""
+    pools = setup["pools"]
     # Root + 5th + octave pattern (human-like variation)
-    base_notes = [0, 7, 12]  # root, 5th, octave
-    scale_intervals = SCALES.get(scale_name, SCALES["minor"])
-    notes_pool = [root + interval for interval in base_notes]
+    notes_pool = list(pools["base"])
     
     # Add some variation - occasionally use 3rd or 6th
-    if random.random() < 0.3:
-        variation_notes = [3, 9] if scale_name == "major" else [3, 8]
-        notes_pool.extend([root + interval for interval in variation_notes])
-    
+    if rng.random() < 0.3:
+        notes_pool.extend(pools["major"] if setup["scale_name"] == "major" else pools["minor"])
+    return notes_pool
+
+
+def _sample_bass(setup, key, first_bar=0, bars=None, notes_pool=None, groove=None):
+    """Stochastic bass layer: note choices, pickups, offsets and fills over the kick lattice."""
+    bars = setup["bars"] if bars is None else bars
+    kick_counts = [len(kicks) for kicks in _groove_onsets(groove, "kick", first_bar, bars)] if groove is not None else None
+    return _humanize_bass(setup, _quantize_bass(setup, key, first_bar, bars, notes_pool, kick_counts), groove)
+
+
+def _quantize_bass(setup, key, first_bar=0, bars=None, notes_pool=None, kick_counts=None):
+    """
+    Quantized bass layer: note choices, pickups, offsets and fills, plus their humanize draws.
+    kick_counts: kicks the drums played in each bar (None or 0 = the nominal kick lattice).
+    Notes locked to a drum kick keep its index (anchor) and their offset from it; the
+    humanize stage places them on the kicks of the (humanized) groove.
+    """
+    ticks_per_bar = PPQ * 4
+    root = setup["root"]
+    bars = setup["bars"] if bars is None else bars
+    if notes_pool is None:
+        notes_pool = _bass_notes_pool(setup, _bar_random(key, 0, _STREAM_LINE))
+    # Choose note - favor root (70%), 5th (20%), octave (10%)
+    note_weights = [0.7, 0.2, 0.1] + [0.025] * len(notes_pool[3:]) if len(notes_pool) > 3 else [0.7, 0.2, 0.1]
+    if kick_counts is None:
+        kick_counts = [0] * bars
+    first_kick = 0
+
+    # Energy-dependent choices as per-bar masks against the energy curve
+    energy = _bar_energies(setup["energy_norm"], first_bar, bars)
+    energy_kicks = [pos for pos, _ in setup["energy_kicks"]]
+    energy_kick_on = (energy[:, None] >= np.array([min_energy for _, min_energy in setup["energy_kicks"]] or [np.inf])).tolist()
+    low_dur, high_dur, dur_threshold = setup["dur"]
+    bar_dur = (PPQ * np.where(energy > dur_threshold, high_dur, low_dur)).tolist()
+    bar_vel = np.where(energy > 7, setup["vel"][1], setup["vel"][0]).tolist()
+    pushed = (energy > 5).tolist()  # bass may land ahead of the kick
+    octave_prob = (energy / 20.0).tolist()
+    fills = (energy >= 7).tolist()
+
     events = []
-    energy_norm = max(1, min(10, energy))
-    density = 0.4 + (energy_norm / 15.0)  # More controlled density
-    
-    # Generate kick pattern first to lock bass to it
-    kick_times = []
-    for bar in range(bars):
-        bar_start = bar * seconds_per_bar
-        # Different kick patterns per genre
-        if "techno" in genre_key:
-            # Techno: every beat
-            kick_times.extend([bar_start + i * seconds_per_beat for i in range(4)])
-        elif "hiphop_boom_bap" in genre_key:
-            # Boom Bap: 1, pickup before 2 (1.75), 3 (core accents)
-            for pos in [0.0, 1.75, 3.0]:
-                kick_times.append(bar_start + pos * seconds_per_beat)
-        elif "hiphop_west_coast" in genre_key:
-            # West Coast: strong 1 and 3 with occasional pickups
-            core = [0.0, 3.0]
-            pickups = [1.75, 3.75] if energy_norm >= 6 else [1.75]
-            for pos in core + pickups:
-                kick_times.append(bar_start + pos * seconds_per_beat)
-        elif "hiphop" in genre_key or "trap" in genre_key:
-            # Generic Hip-hop/Trap fallback
-            kick_times.extend([bar_start, bar_start + 2 * seconds_per_beat])
-            if "trap" in genre_key and random.random() < 0.4:
-                kick_times.append(bar_start + 2.5 * seconds_per_beat)
-        elif "drum_and_bass" in genre_key:
-            # DnB: syncopated, more complex
-            kick_times.extend([bar_start + i * seconds_per_beat for i in [0, 1.5, 2.5, 3.5]])
-        else:
-            # Default: every other beat
-            kick_times.extend([bar_start, bar_start + 2 * seconds_per_beat])
-    
-    # Lock bass to kick placement with human variation
-    for kick_time in kick_times:
-        # Bass hits slightly before or on kick (human feel)
-        bass_offset = random.uniform(-0.02, 0.01) if energy_norm > 5 else -0.01
-        t = kick_time + bass_offset
-        
-        # Choose note - favor root (70%), 5th (20%), octave (10%)
-        note_weights = [0.7, 0.2, 0.1] + [0.025] * len(notes_pool[3:]) if len(notes_pool) > 3 else [0.7, 0.2, 0.1]
-        pitch = random.choices(notes_pool, weights=note_weights[:len(notes_pool)])[0]
-        
-        # Duration based on energy and genre
-        if genre_key in ["techno", "hardtechno"]:
-            dur = seconds_per_beat * 0.25 if energy_norm > 7 else seconds_per_beat * 0.5
-        elif "hiphop_boom_bap" in genre_key:
-            # Punchy, shorter notes that sit with the kick
-            dur = seconds_per_beat * (0.4 if energy_norm >= 6 else 0.55)
-        elif "hiphop_west_coast" in genre_key:
-            # More sustained, laid-back bass
-            dur = seconds_per_beat * (1.0 if energy_norm <= 7 else 0.8)
-        elif "hiphop" in genre_key:
-            dur = seconds_per_beat * 0.75
+    anchors = []
+    event_bars = []
+    for i, ((bar, rng), n_kicks) in enumerate(zip(_bar_randoms(key, first_bar, bars), kick_counts)):
+        bar_start = bar * ticks_per_bar
+        vel, dur = bar_vel[i], bar_dur[i]
+        bar_events = []
+
+        if n_kicks:
+            # Kicks the drums actually played in this bar: offsets from the kick they lock to
+            kick_times = [0] * n_kicks
+            kick_anchors = list(range(first_kick, first_kick + n_kicks))
+            first_kick += n_kicks
         else:
-            dur = seconds_per_beat * (0.5 if energy_norm > 6 else 1.0)
-        
-        # Velocity dynamics
-        vel_base = 75 if "techno" in genre_key else 85
-        vel_variation = 15 if energy_norm > 7 else 10
-        vel = velocity_for(0.8, base=vel_base, variation=vel_variation)
-        
-        # Occasionally add octave jumps for energy
-        if random.random() < (energy_norm / 20.0):
-            pitch += 12
+            # Generate kick pattern first to lock bass to it
+            kick_times = [bar_start + pos for pos in setup["kicks"]]
+            kick_times += [bar_start + pos for pos, on in zip(energy_kicks, energy_kick_on[i]) if on]
+            for pos, prob in setup["chance_kicks"]:
+                if rng.random() < prob:
+                    kick_times.append(bar_start + pos)
+            kick_anchors = [-1] * len(kick_times)
+
+        # Lock bass to kick placement with human variation
+        for kick_time in kick_times:
+            # Bass hits slightly before or on kick (human feel)
+            bass_offset = rng.uniform(-0.02, 0.01) if pushed[i] else -0.01
+            t = kick_time + bass_offset * _REF_TICKS_PER_SECOND
+            pitch = rng.choices(notes_pool, weights=note_weights[:len(notes_pool)])[0]
+            
+            # Occasionally add octave jumps for energy
+            if rng.random() < octave_prob[i]:
+                pitch += 12
+            
+            bar_events.append((t, pitch, vel, dur))
         
-        events.append((t, pitch, vel, dur))
-    
-    # Add some fills and variations for higher energy
-    if energy_norm >= 7:
-        for bar in range(bars):
-            bar_start = bar * seconds_per_bar
+        # Add some fills and variations for higher energy
+        if fills[i]:
             # Occasional 16th note fills
-            if random.random() < 0.3:
-                for i in range(4):
-                    t = bar_start + i * (seconds_per_beat / 4)
-                    if random.random() < 0.6:  # Only 60% of potential fill notes
-                        pitch = events[-1][1] if events else (root + 12)
-                        events.append((t, pitch, velocity_for(0.6), seconds_per_beat / 8))
-
+            if rng.random() < 0.3:
+                for step in range(4):
+                    t = bar_start + step * (PPQ / 4)
+                    if rng.random() < 0.6:  # Only 60% of potential fill notes
+                        pitch = bar_events[-1][1] if bar_events else (root + 12)
+                        bar_events.append((t, pitch, velocity_for(0.6), PPQ / 8))
+        events.extend(bar_events)
+        anchors.extend(kick_anchors + [-1] * (len(bar_events) - len(kick_anchors)))
+        event_bars.append(len(bar_events))
+
+    # Humanize draws for every note (per-bar counters)
+    bar = np.repeat(np.arange(first_bar, first_bar + bars), event_bars)
+    index = np.arange(len(bar)) - np.repeat(np.cumsum(event_bars) - event_bars, event_bars)
+    uniforms = (_counter_uniforms(key, bar, _STREAM_HUMANIZE, 2 * index),
+                _counter_uniforms(key, bar, _STREAM_HUMANIZE, 2 * index + 1))
+    tick, pitch, vel, dur = (np.array(column, dtype=np.float64) for column in zip(*events)) if events else (np.zeros(0),) * 4
+    return {"tick": tick, "pitch": pitch, "vel": vel, "dur": dur, "anchor": np.array(anchors, dtype=np.int64),
+            "bar": bar, "uniforms": uniforms, "first_bar": first_bar, "bars": bars}
+
+
+def _humanize_bass(setup, quantized, groove=None, humanize_intensity=None):
+    """Swing + humanization stage of a quantized bass layer, locked to the groove's kicks."""
+    if humanize_intensity is None:
+        humanize_intensity = setup["humanize_intensity"]
+    tick, anchor = quantized["tick"], quantized["anchor"]
+    locked = anchor >= 0
+    if locked.any():
+        onsets = _groove_onsets(groove, "kick", quantized["first_bar"], quantized["bars"])
+        kicks = np.array([t for bar_kicks in onsets for t in bar_kicks], dtype=np.int64)
+        tick = tick.copy()
+        tick[locked] = kicks[anchor[locked]] + tick[locked]
+    events = EventBlock(np.maximum(0, np.rint(tick)), quantized["pitch"], quantized["vel"],
+                        np.maximum(1, np.rint(quantized["dur"])))
     # Apply subtle humanization to bass for natural groove
-    events = apply_swing_and_humanization(events, genre_key, energy_norm, swing_amount=0.02, humanize_intensity=humanize_intensity, bpm=bpm)
-
-    events.sort(key=lambda x: x[0])
-    return events
+    events = apply_swing_and_humanization(events, setup["genre_key"], _energy_at(setup["energy_norm"], quantized["bar"]), swing_amount=0.02,
+                                          humanize_intensity=humanize_intensity, uniforms=quantized["uniforms"])
+    return events.sorted()
 
 
 # -------------------------
 # Melody generation (NEW)
 # -------------------------
-def generate_melody_events(genre, bpm, energy=5, bars=8, mood="neutral", humanize_intensity=0.6):
+def _melody_techno(pitches, bars, ticks_per_beat):
+    # Repetitive stabs that complement the driving kick
+    ticks_per_bar = ticks_per_beat * 4
+    # Use scale-consistent arpeggio, one octave up
+    scale_notes = pitches[1][:5]
+    arpeggio = [0, 2, 4, 2, 0]  # More musical arpeggio pattern
+    events = []
+    for bar, rng, energy_norm in bars:
+        bar_start = bar * ticks_per_bar
+        # Main stabs on downbeats - lock with kick
+        for beat in (0, 2):
+            t = bar_start + beat * ticks_per_beat
+            arp_idx = int(beat / 2) % len(arpeggio)
+            pitch = scale_notes[arp_idx % len(scale_notes)]
+            events.append((t, pitch, velocity_for(0.7), ticks_per_beat * 0.25))
+
+            # Offbeat accents - complement hats
+            if rng.random() < 0.4 and energy_norm >= 5:
+                t_off = t + ticks_per_beat * 0.5
+                pitch_off = scale_notes[(arp_idx + 2) % len(scale_notes)]
+                events.append((t_off, pitch_off, velocity_for(0.55), ticks_per_beat * 0.15))
+    return events
+
+
+def _melody_trance(pitches, bars, ticks_per_beat):
+    # Trance: flowing melodies that support the build
+    ticks_per_bar = ticks_per_beat * 4
+    # Use consistent scale, two octaves up
+    notes = pitches[2]
+    # Create more musical motif
+    motif = [0, 2, 4, 7, 4, 2, 0]  # Classic trance progression
+    events = []
+    for bar, rng, energy_norm in bars:
+        bar_start = bar * ticks_per_bar
+        # Evolving motif that builds energy
+        for i, step in enumerate(motif):
+            t = bar_start + i * (ticks_per_bar / len(motif))
+            if rng.random() < 0.85:
+                pitch = notes[step % len(notes)]
+                # Velocity builds through the bar
+                vel_factor = 0.7 + (i / len(motif)) * 0.2
+                events.append((t, pitch, velocity_for(vel_factor), ticks_per_beat * 0.5))
+
+        # Add counter-melody at higher energy
+        if energy_norm >= 7 and bar % 2 == 0:
+            counter_notes = notes[2:5]  # Higher register
+            for i in range(4):
+                t = bar_start + i * ticks_per_beat + ticks_per_beat * 0.25
+                pitch = counter_notes[i % len(counter_notes)]
+                events.append((t, pitch, velocity_for(0.4), ticks_per_beat * 0.25))
+    return events
+
+
+def _melody_dnb_chops(pitches, bars, ticks_per_beat):
+    # Classic DnB: sparse, rhythmic chops that work with drums
+    ticks_per_bar = ticks_per_beat * 4
+    notes = pitches[1][:7]
+    events = []
+    for bar, rng, energy_norm in bars:
+        bar_start = bar * ticks_per_bar
+        # Place notes on off-beats to complement kick/snare pattern
+        chop_positions = [1, 3, 5, 7, 9, 11, 13, 15]  # 16th note off-beats
+        for pos in chop_positions:
+            if rng.random() < 0.5:  # 50% chance for each position
+                t = bar_start + pos * (ticks_per_bar / 16.0)
+                # Choose notes that work with the harmony
+                if pos % 4 == 1:  # Strong off-beats
+                    pitch = notes[0]  # Root
+                    vel = velocity_for(0.7)
+                elif pos % 4 == 3:  # Medium off-beats
+                    pitch = notes[2]  # Third
+                    vel = velocity_for(0.6)
+                else:  # Weak off-beats
+                    pitch = rng.choice(notes[1:4])  # Scale tones
+                    vel = velocity_for(0.5)
+
+                # Short, staccato notes for classic feel
+                events.append((t, pitch, vel, ticks_per_beat * 0.15))
+    return events
+
+
+def _melody_dnb_flow(pitches, bars, ticks_per_beat):
+    # Liquid DnB: smoother, more flowing melodies
+    ticks_per_bar = ticks_per_beat * 4
+    notes = pitches[1][:7]
+    events = []
+    for bar, rng, energy_norm in bars:
+        bar_start = bar * ticks_per_bar
+        # 8th note patterns that complement the rolling bass
+        for i in range(8):
+            t = bar_start + i * (ticks_per_bar / 8.0)
+            if rng.random() < 0.6:  # Higher density for liquid
+                # Create more melodic patterns
+                if i % 4 == 0:
+                    pitch = notes[0]  # Root
+                elif i % 2 == 0:
+                    pitch = notes[4]  # Fifth
+                else:
+                    pitch = rng.choice(notes[1:4])  # Scale tones
+
+                vel = velocity_for(0.6)
+                # Longer notes for liquid feel
+                events.append((t, pitch, vel, ticks_per_beat * 0.3))
+    return events
+
+
+def _melody_boom_bap(pitches, bars, ticks_per_beat):
+    # Boom bap: chopped samples that complement snare hits
+    ticks_per_bar = ticks_per_beat * 4
+    notes = pitches[1][:6]
+    events = []
+    for bar, rng, energy_norm in bars:
+        bar_start = bar * ticks_per_bar
+        chop_positions = [0.0, 1.5, 2.5, 3.5]  # Syncopated with snare
+        for pos in chop_positions:
+            t = bar_start + pos * ticks_per_beat
+            if rng.random() < 0.7:
+                # Create chord-like stabs
+                for tri in (0, 2, 4):  # Simple chord tones
+                    if tri < len(notes):
+                        pitch = notes[(int(pos) + tri) % len(notes)]
+                        # Short, punchy notes
+                        events.append((t, pitch, velocity_for(0.5), ticks_per_beat * 0.2))
+    return events
+
+
+def _melody_hiphop(pitches, bars, ticks_per_beat):
+    # Modern hip-hop: sparse melodic elements
+    ticks_per_bar = ticks_per_beat * 4
+    notes = pitches[1][:6]
+    events = []
+    for bar, rng, energy_norm in bars:
+        bar_start = bar * ticks_per_bar
+        for i in range(4):  # Quarter notes
+            t = bar_start + i * ticks_per_beat
+            if rng.random() < 0.4:
+                pitch = notes[i % len(notes)]
+                # Longer, sustained notes
+                events.append((t, pitch, velocity_for(0.6), ticks_per_beat * 0.8))
+    return events
+
+
+def _melody_industrial(pitches, bars, ticks_per_beat):
+    # Industrial/EBM: harsh, rhythmic stabs that complement the drive
+    ticks_per_bar = ticks_per_beat * 4
+    # Use more dissonant intervals for industrial feel
+    notes = pitches[1][:4] + [pitches[1][0] + 1, pitches[1][2] + 1]  # Add some dissonance
+    events = []
+    for bar, rng, energy_norm in bars:
+        bar_start = bar * ticks_per_bar
+        # Rhythmic stabs that lock with the kick
+        for i in range(4):
+            t = bar_start + i * ticks_per_beat
+            if rng.random() < 0.6:  # Higher hit rate for industrial
+                pitch = rng.choice(notes)
+                # Hard, punchy notes
+                events.append((t, pitch, velocity_for(0.8), ticks_per_beat * 0.15))
+
+            # Add noise/harsh elements at higher energy
+            if energy_norm >= 7:
+                t_noise = t + rng.uniform(-0.05, 0.05) * _REF_TICKS_PER_SECOND
+                pitch_noise = rng.choice(notes)
+                events.append((t_noise, pitch_noise, velocity_for(0.4), ticks_per_beat * 0.1))
+    return events
+
+
+def _melody_default(pitches, bars, ticks_per_beat):
+    # Default: simple melodic patterns that complement the rhythm
+    ticks_per_bar = ticks_per_beat * 4
+    notes = pitches[1][:5]
+    events = []
+    for bar, rng, energy_norm in bars:
+        bar_start = bar * ticks_per_bar
+        # Simple, supportive melody
+        for i in range(4):
+            t = bar_start + i * ticks_per_beat
+            if rng.random() < 0.7:
+                pitch = notes[i % len(notes)]
+                events.append((t, pitch, velocity_for(0.6), ticks_per_beat * 0.8))
+    return events
+
+
+def generate_melody_events(genre, bpm, energy=5, bars=8, mood="neutral", humanize_intensity=0.6, rng=None, first_bar=0, groove=None):
     """
-    Generate melody events list: (time, midi_note, velocity, duration)
+    Generate melody events as an EventBlock on the tempo-free tick timeline
+    (bpm is accepted for API compatibility; tempo is applied at export).
+    energy: 1..10 or a per-bar energy curve (see generate_drum_events).
+    rng: int seed, random.Random or numpy Generator (fresh entropy if None).
+    first_bar: start of the bar range (see generate_drum_events).
+    groove: drum groove context for these bars; the melody then takes the drums'
+            swing and per-bar energy.
     Enhanced for better musical cohesion with drums and bass.
     """
-    beats_per_bar = 4
-    seconds_per_beat = 60.0 / bpm
-    seconds_per_bar = seconds_per_beat * beats_per_bar
+    setup = _melody_setup(genre, energy, bars, mood)
+    return _sample_melody(setup, track_key(rng, "melody"), first_bar, groove=groove)
+
+
+def _melody_setup(genre, energy=5, bars=8, mood="neutral"):
+    """Deterministic melody inputs shared across variations: style and the genre's pitch rows."""
+    profile = genre_profile(_genre_key(genre))
+    return {
+        "style": profile["melody"], "root": profile["root"], "bars": bars,
+        "energy_norm": (_energy_levels(energy) - 1) / 9.0,  # normalize to 0-1
+        # Choose scale based on mood/genre - ensure consistency with bass
+        "pitches": profile["pitches"].get(_scale_for(profile, mood), profile["pitches"]["minor"]),
+    }
 
-    genre_key = _genre_key(genre)
-    root = pick_genre_root(genre_key)
-    energy_norm = (energy - 1) / 9.0  # normalize to 0-1
-    
-    # Choose scale based on mood/genre - ensure consistency with bass
-    if "dark" in mood.lower() or "industrial" in genre_key or "hard" in genre_key:
-        scale_name = "phrygian" if "industrial" in genre_key else "aeolian"
-    elif "uplifting" in mood.lower() or "trance" in genre_key:
-        scale_name = "major"
+
+def _sample_melody(setup, key, first_bar=0, bars=None, groove=None):
+    bars = setup["bars"] if bars is None else bars
+    if groove is not None:
+        offset = first_bar - groove["first_bar"]
+        energies = ((groove["energy"][offset:offset + bars] - 1) / 9.0).tolist()
     else:
-        scale_name = "minor"
+        energies = _bar_energies(setup["energy_norm"], first_bar, bars).tolist()
+    bar_plan = [(bar, rng, energy_norm) for (bar, rng), energy_norm in zip(_bar_randoms(key, first_bar, bars), energies)]
+    events = EventBlock.from_tuples(setup["style"](setup["pitches"], bar_plan, PPQ))
+    if groove is not None:
+        events = _apply_swing_map(events, groove["swing"])
+    return events.sorted()
 
-    intervals = SCALES.get(scale_name, SCALES["minor"])
-    events = []
 
-    if "techno" in genre_key:
-        # Repetitive stabs that complement the driving kick
-        melody_root = root + 12
-        # Use scale-consistent arpeggio
-        scale_notes = [melody_root + i for i in intervals[:5]]
-        arpeggio = [0, 2, 4, 2, 0]  # More musical arpeggio pattern
-        
-        for bar in range(bars):
-            bar_start = bar * seconds_per_bar
-            # Main stabs on downbeats - lock with kick
-            for beat in (0, 2):
-                t = bar_start + beat * seconds_per_beat
-                arp_idx = int(beat / 2) % len(arpeggio)
-                pitch = scale_notes[arp_idx % len(scale_notes)]
-                events.append((t, pitch, velocity_for(0.7), seconds_per_beat * 0.25))
-                
-                # Offbeat accents - complement hats
-                if random.random() < 0.4 and energy_norm >= 5:
-                    t_off = t + seconds_per_beat * 0.5
-                    pitch_off = scale_notes[(arp_idx + 2) % len(scale_notes)]
-                    events.append((t_off, pitch_off, velocity_for(0.55), seconds_per_beat * 0.15))
-
-    elif "trance" in genre_key or "uplifting" in genre_key:
-        # Trance: flowing melodies that support the build
-        melody_root = root + 24
-        # Use consistent scale
-        notes = [melody_root + i for i in intervals]
-        # Create more musical motif
-        motif = [0, 2, 4, 7, 4, 2, 0]  # Classic trance progression
-        
-        for bar in range(bars):
-            bar_start = bar * seconds_per_bar
-            # Evolving motif that builds energy
-            for i, step in enumerate(motif):
-                t = bar_start + i * (seconds_per_bar / len(motif))
-                if random.random() < 0.85:
-                    pitch = notes[step % len(notes)]
-                    # Velocity builds through the bar
-                    vel_factor = 0.7 + (i / len(motif)) * 0.2
-                    events.append((t, pitch, velocity_for(vel_factor), seconds_per_beat * 0.5))
-            
-            # Add counter-melody at higher energy
-            if energy_norm >= 7 and bar % 2 == 0:
-                counter_notes = [melody_root + i for i in intervals[2:5]]  # Higher register
-                for i in range(4):
-                    t = bar_start + i * seconds_per_beat + seconds_per_beat * 0.25
-                    pitch = counter_notes[i % len(counter_notes)]
-                    events.append((t, pitch, velocity_for(0.4), seconds_per_beat * 0.25))
+# -------------------------
+# Streaming generators (constant memory, any length)
+# -------------------------
+# Humanization can pull an onset slightly across a chunk edge, so the tail of each
+# chunk (this many ticks) is held back and merged into the next one before yielding.
+_STREAM_HOLDBACK = PPQ
 
-    elif "drum_and_bass" in genre_key:
-        # DnB: chopped melodies that complement breakbeats
-        melody_root = root + 12
-        notes = [melody_root + d for d in intervals[:7]]
-        
-        for bar in range(bars):
-            bar_start = bar * seconds_per_bar
-            
-            if "classic" in genre_key:
-                # Classic DnB: sparse, rhythmic chops that work with drums
-                # Place notes on off-beats to complement kick/snare pattern
-                chop_positions = [1, 3, 5, 7, 9, 11, 13, 15]  # 16th note off-beats
-                for pos in chop_positions:
-                    if random.random() < 0.5:  # 50% chance for each position
-                        t = bar_start + pos * (seconds_per_bar / 16.0)
-                        # Choose notes that work with the harmony
-                        if pos % 4 == 1:  # Strong off-beats
-                            pitch = notes[0]  # Root
-                            vel = velocity_for(0.7)
-                        elif pos % 4 == 3:  # Medium off-beats
-                            pitch = notes[2]  # Third
-                            vel = velocity_for(0.6)
-                        else:  # Weak off-beats
-                            pitch = random.choice(notes[1:4])  # Scale tones
-                            vel = velocity_for(0.5)
-                        
-                        # Short, staccato notes for classic feel
-                        events.append((t, pitch, vel, seconds_per_beat * 0.15))
-            else:
-                # Liquid DnB: smoother, more flowing melodies
-                # 8th note patterns that complement the rolling bass
-                for i in range(8):
-                    t = bar_start + i * (seconds_per_bar / 8.0)
-                    if random.random() < 0.6:  # Higher density for liquid
-                        # Create more melodic patterns
-                        if i % 4 == 0:
-                            pitch = notes[0]  # Root
-                        elif i % 2 == 0:
-                            pitch = notes[4]  # Fifth
-                        else:
-                            pitch = random.choice(notes[1:4])  # Scale tones
-                        
-                        vel = velocity_for(0.6)
-                        # Longer notes for liquid feel
-                        events.append((t, pitch, vel, seconds_per_beat * 0.3))
-
-    elif "hiphop" in genre_key:
-        # Hip-hop: sampled-style chops that work with the beat
-        melody_root = root + 12
-        notes = [melody_root + d for d in intervals[:6]]
-        
-        for bar in range(bars):
-            bar_start = bar * seconds_per_bar
-            
-            if "boom_bap" in genre_key:
-                # Boom bap: chopped samples that complement snare hits
-                chop_positions = [0.0, 1.5, 2.5, 3.5]  # Syncopated with snare
-                for pos in chop_positions:
-                    t = bar_start + pos * seconds_per_beat
-                    if random.random() < 0.7:
-                        # Create chord-like stabs
-                        base_note = notes[int(pos) % len(notes)]
-                        for tri in (0, 2, 4):  # Simple chord tones
-                            if tri < len(notes):
-                                pitch = notes[(int(pos) + tri) % len(notes)]
-                                # Short, punchy notes
-                                events.append((t, pitch, velocity_for(0.5), seconds_per_beat * 0.2))
-            else:
-                # Modern hip-hop: sparse melodic elements
-                for i in range(4):  # Quarter notes
-                    t = bar_start + i * seconds_per_beat
-                    if random.random() < 0.4:
-                        pitch = notes[i % len(notes)]
-                        # Longer, sustained notes
-                        events.append((t, pitch, velocity_for(0.6), seconds_per_beat * 0.8))
-
-    elif "industrial" in genre_key or "ebm" in genre_key:
-        # Industrial/EBM: harsh, rhythmic stabs that complement the drive
-        melody_root = root + 12
-        # Use more dissonant intervals for industrial feel
-        noisy_intervals = intervals[:4] + [intervals[0] + 1, intervals[2] + 1]  # Add some dissonance
-        notes = [melody_root + i for i in noisy_intervals]
-        
-        for bar in range(bars):
-            bar_start = bar * seconds_per_bar
-            # Rhythmic stabs that lock with the kick
-            for i in range(4):
-                t = bar_start + i * seconds_per_beat
-                if random.random() < 0.6:  # Higher hit rate for industrial
-                    pitch = random.choice(notes)
-                    # Hard, punchy notes
-                    events.append((t, pitch, velocity_for(0.8), seconds_per_beat * 0.15))
-                
-                # Add noise/harsh elements at higher energy
-                if energy_norm >= 7:
-                    t_noise = t + random.uniform(-0.05, 0.05)
-                    pitch_noise = random.choice(notes)
-                    events.append((t_noise, pitch_noise, velocity_for(0.4), seconds_per_beat * 0.1))
 
-    else:
-        # Default: simple melodic patterns that complement the rhythm
-        melody_root = root + 12
-        notes = [melody_root + d for d in intervals[:5]]
-        
-        for bar in range(bars):
-            bar_start = bar * seconds_per_bar
-            # Simple, supportive melody
-            for i in range(4):
-                t = bar_start + i * seconds_per_beat
-                if random.random() < 0.7:
-                    pitch = notes[i % len(notes)]
-                    events.append((t, pitch, velocity_for(0.6), seconds_per_beat * 0.8))
+def _bar_chunks(bars, chunk_bars, first_bar=0):
+    """(first_bar, n_bars) pairs covering `bars` bars from first_bar, or forever when bars is None."""
+    end = None if bars is None else first_bar + bars
+    while end is None or first_bar < end:
+        n = chunk_bars if end is None else min(chunk_bars, end - first_bar)
+        yield first_bar, n
+        first_bar += n
 
-    events.sort(key=lambda x: x[0])
-    return events
+
+def _ordered_stream(sample_chunk, bars, chunk_bars, first_bar=0):
+    """
+    Call sample_chunk(first_bar, n_bars) chunk by chunk and yield EventBlocks whose
+    ticks never decrease across the whole stream. Only one chunk is held at a time.
+    """
+    pending = EventBlock()
+    for first_bar, n in _bar_chunks(bars, max(1, int(chunk_bars)), first_bar):
+        block = EventBlock.merge([pending, sample_chunk(first_bar, n)])
+        cut = np.searchsorted(block.tick, (first_bar + n) * 4 * PPQ - _STREAM_HOLDBACK, side="left")
+        pending = block[cut:]
+        yield block[:cut]
+    if len(pending):
+        yield pending
+
+
+def stream_drum_events(genre, energy=5, bars=None, chunk_bars=4, break_preset="amen", snare_snap=False, hat_layout="standard", humanize_intensity=0.6, lofi_vinyl=False, rng=None, first_bar=0):
+    """
+    Yield drum events chunk_bars bars (one phrase by default) at a time as ordered
+    EventBlocks on the absolute tick timeline, starting at first_bar. bars=None streams
+    without end. With an int seed the events equal generate_drum_events' for the same bars.
+    """
+    setup = _drum_setup(genre, energy, chunk_bars, break_preset, snare_snap, hat_layout, humanize_intensity, lofi_vinyl)
+    return _drum_stream(setup, track_key(rng, "drums"), bars, chunk_bars, first_bar)
+
+
+def stream_bass_events(genre, energy=5, bars=None, chunk_bars=4, mood="neutral", humanize_intensity=0.6, rng=None, first_bar=0):
+    """Yield the bassline chunk_bars bars at a time as ordered EventBlocks (bars=None: endless)."""
+    setup = _bass_setup(genre, energy, chunk_bars, mood, humanize_intensity)
+    return _bass_stream(setup, track_key(rng, "bass"), bars, chunk_bars, first_bar)
+
+
+def stream_melody_events(genre, energy=5, bars=None, chunk_bars=4, mood="neutral", rng=None, first_bar=0):
+    """Yield the melody chunk_bars bars at a time as ordered EventBlocks (bars=None: endless)."""
+    setup = _melody_setup(genre, energy, chunk_bars, mood)
+    return _melody_stream(setup, track_key(rng, "melody"), bars, chunk_bars, first_bar)
+
+
+def _drum_stream(setup, key, bars, chunk_bars, first_bar=0):
+    return _ordered_stream(lambda first, n: _sample_drums(setup, key, first, n), bars, chunk_bars, first_bar)
+
+
+def _bass_stream(setup, key, bars, chunk_bars, first_bar=0, groove_for=None):
+    """groove_for(first, n): optional groove context of each chunk."""
+    notes_pool = _bass_notes_pool(setup, _bar_random(key, 0, _STREAM_LINE))
+    return _ordered_stream(lambda first, n: _sample_bass(setup, key, first, n, notes_pool,
+                                                         groove_for(first, n) if groove_for else None),
+                           bars, chunk_bars, first_bar)
+
+
+def _melody_stream(setup, key, bars, chunk_bars, first_bar=0, groove_for=None):
+    return _ordered_stream(lambda first, n: _sample_melody(setup, key, first, n,
+                                                           groove_for(first, n) if groove_for else None),
+                           bars, chunk_bars, first_bar)
+
+
+# -------------------------
+# Genre registry
+# -------------------------
+# Exact genre keys -> precompiled profiles, built once at import. Every generator
+# dispatches through genre_profile() instead of chains of substring tests, and the
+# Streamlit selector is generated from the category/label fields.
+_SWING_PROFILES = {
+    # name: (swing multiplier, timing humanize range (s), velocity humanize range)
+    "tight": (0.5, 0.003, 0.03),        # DnB: less swing, precise timing
+    "loose": (1.2, 0.008, 0.06),        # Hip-hop: more swing, looser timing
+    "mechanical": (0.3, 0.002, 0.02),   # Techno/industrial: mechanical precision
+    "default": (1.0, 0.005, 0.04),
+}
+
+_BASS_STYLES = {
+    # Nominal kick lattice, used when there is no drum groove (or a bar has no kicks):
+    # kicks: beat positions every bar; energy_kicks: (pos, min energy); chance_kicks: (pos, prob) per bar
+    # dur: (beats, beats when energy > threshold, threshold)
+    "four": {"kicks": (0, 1, 2, 3), "energy_kicks": (), "chance_kicks": (), "dur": (0.5, 0.25, 7), "vel_base": 75},
+    "four_soft": {"kicks": (0, 1, 2, 3), "energy_kicks": (), "chance_kicks": (), "dur": (1.0, 0.5, 6), "vel_base": 75},
+    "boom_bap": {"kicks": (0.0, 1.75, 3.0), "energy_kicks": (), "chance_kicks": (), "dur": (0.55, 0.4, 5), "vel_base": 85},
+    "west_coast": {"kicks": (0.0, 3.0, 1.75), "energy_kicks": ((3.75, 6),), "chance_kicks": (), "dur": (1.0, 0.8, 7), "vel_base": 85},
+    "trap": {"kicks": (0, 2), "energy_kicks": (), "chance_kicks": ((2.5, 0.4),), "dur": (0.75, 0.75, 7), "vel_base": 85},
+    "hiphop": {"kicks": (0, 2), "energy_kicks": (), "chance_kicks": (), "dur": (0.75, 0.75, 7), "vel_base": 85},
+    "drum_and_bass": {"kicks": (0, 1.5, 2.5, 3.5), "energy_kicks": (), "chance_kicks": (), "dur": (1.0, 0.5, 6), "vel_base": 85},
+    "default": {"kicks": (0, 2), "energy_kicks": (), "chance_kicks": (), "dur": (1.0, 0.5, 6), "vel_base": 85},
+}
+
+
+def _genre(category, label, root, drums, family="default", swing="default", bass="default",
+           melody=_melody_default, scale=None, default_scale="minor"):
+    return {
+        "category": category, "label": label, "root": root, "family": family,
+        "drums": drums, "swing": _SWING_PROFILES[swing], "bass": _BASS_STYLES[bass],
+        "melody": melody, "scale": scale, "default_scale": default_scale,
+    }
+
+
+def _build_genre_registry():
+    techno = functools.partial(_grid_techno, is_peak=False, is_acid=False)
+    techno_peak = functools.partial(_grid_techno, is_peak=True, is_acid=False)
+    techno_acid = functools.partial(_grid_techno, is_peak=False, is_acid=True)
+    # Insertion order is the order shown in the UI
+    registry = {
+        "drum_and_bass_classic": _genre("Drum & Bass", "Classic (Amen/Think)", 36, _grid_drum_and_bass_classic,
+                                        "drum_and_bass", "tight", "drum_and_bass", _melody_dnb_chops),
+        "drum_and_bass_liquid": _genre("Drum & Bass", "Liquid", 36, _grid_drum_and_bass_liquid,
+                                       "drum_and_bass", "tight", "drum_and_bass", _melody_dnb_flow),
+        "drum_and_bass_stepper": _genre("Drum & Bass", "Stepper (Chase & Status)", 36, _grid_drum_and_bass_stepper,
+                                        "drum_and_bass", "tight", "drum_and_bass", _melody_dnb_flow),
+        "drum_and_bass_neuro": _genre("Drum & Bass", "Neurofunk", 36, _grid_drum_and_bass_neuro,
+                                      "drum_and_bass", "tight", "drum_and_bass", _melody_dnb_flow),
+        "hiphop_boom_bap": _genre("Hip-Hop", "Boom Bap (DJ Premier)", GENRE_ROOTS["hiphop_boom_bap"], _grid_hiphop_boom_bap,
+                                  "hiphop", "loose", "boom_bap", _melody_boom_bap),
+        "hiphop_west_coast": _genre("Hip-Hop", "West Coast (Dr. Dre)", GENRE_ROOTS["hiphop_west_coast"], _grid_hiphop_west_coast,
+                                    "hiphop", "loose", "west_coast", _melody_hiphop),
+        "hiphop_trap": _genre("Hip-Hop", "Trap", GENRE_ROOTS["hiphop_trap"], _grid_hiphop_trap,
+                              "hiphop", "loose", "trap", _melody_hiphop),
+        "house": _genre("House", "Classic House", GENRE_ROOTS["house"], _grid_house, "house"),
+        "tech_house": _genre("House", "Tech House", GENRE_ROOTS["tech_house"], _grid_tech_house, "house"),
+        "deep_house": _genre("House", "Deep House", GENRE_ROOTS["deep_house"], _grid_deep_house, "house"),
+        "uk_garage": _genre("House", "UK Garage", GENRE_ROOTS["uk_garage"], _grid_uk_garage, "house"),
+        "reggaeton_dembow": _genre("Reggaeton", "Dembow", GENRE_ROOTS["reggaeton_dembow"], _grid_reggaeton_dembow),
+        "pop": _genre("Pop", "Standard", GENRE_ROOTS["pop"], _grid_pop),
+        "rock": _genre("Rock", "Standard", GENRE_ROOTS["rock"], _grid_rock),
+        "afrobeat": _genre("Afrobeat", "Modern", GENRE_ROOTS["afrobeat"], _grid_afrobeat),
+        "jazz_swing": _genre("Jazz", "Swing", GENRE_ROOTS["jazz_swing"], _grid_jazz_swing),
+        "techno": _genre("Techno", "Standard", GENRE_ROOTS["techno"], techno,
+                         "techno", "mechanical", "four", _melody_techno),
+        "techno_peak": _genre("Techno", "Peak", GENRE_ROOTS["techno_peak"], techno_peak,
+                              "techno", "mechanical", "four_soft", _melody_techno),
+        "techno_acid": _genre("Techno", "Acid", GENRE_ROOTS["techno_acid"], techno_acid,
+                              "techno", "mechanical", "four_soft", _melody_techno),
+        "trance_uplifting": _genre("Trance", "Uplifting", GENRE_ROOTS["trance_uplifting"], _grid_trance,
+                                   "trance", melody=_melody_trance, default_scale="major"),
+        "trance": _genre("Trance", "Standard", GENRE_ROOTS["trance"], _grid_trance,
+                         "trance", melody=_melody_trance, default_scale="major"),
+        "industrial": _genre("Industrial / EBM / Electro", "Industrial", GENRE_ROOTS["industrial"], _grid_industrial,
+                             "industrial", "mechanical", melody=_melody_industrial, scale="phrygian"),
+        "ebm": _genre("Industrial / EBM / Electro", "EBM", GENRE_ROOTS["ebm"], _grid_ebm,
+                      "ebm", melody=_melody_industrial),
+        "electro": _genre("Industrial / EBM / Electro", "Electro", GENRE_ROOTS["electro"], _grid_ebm, "ebm"),
+        "lofi": _genre("Lo-Fi", "Standard", GENRE_ROOTS["lofi"], _grid_default),
+        "experimental": _genre("Experimental", "Standard", GENRE_ROOTS["experimental"], _grid_default),
+        # Family aliases (not in the menu): bare or unknown variants such as "hiphop" or
+        # "drum_and_bass_jungle" resolve here rather than to "default"
+        "drum_and_bass": _genre(None, None, GENRE_ROOTS["default"], _grid_drum_and_bass_liquid,
+                                "drum_and_bass", "tight", "drum_and_bass", _melody_dnb_flow),
+        "hiphop": _genre(None, None, GENRE_ROOTS["default"], _grid_default,
+                         "hiphop", "loose", "hiphop", _melody_hiphop),
+        "default": _genre(None, None, GENRE_ROOTS["default"], _grid_default),
+    }
+    for key, profile in registry.items():
+        profile["key"] = key
+        # Note pools, built once: pitch rows per scale and the bass root/5th/octave (+ 3rd/6th) sets
+        root = profile["root"]
+        profile["pitches"] = {name: _pitch_rows(root, name) for name in SCALES}
+        profile["bass_pools"] = {"base": [root, root + 7, root + 12],
+                                 "major": [root + 3, root + 9], "minor": [root + 3, root + 8]}
+    return registry
+
+
+GENRE_REGISTRY = _build_genre_registry()
+# Scale locks for unknown keys by substring ("hardtechno" -> aeolian); a profile's own scale wins
+_GENRE_SCALE_RULES = (("hard", "aeolian"),)
+_GENRE_ALIASES = {}
+_GENRE_ALIASES_MAX = 256
+
+
+def genre_profile(genre_key):
+    """
+    O(1) lookup of the profile for a normalized genre key.
+    Unknown keys (e.g. "dark_techno", "drum_and_bass_jungle") resolve to the longest
+    registry key they contain, falling back to "default", with _GENRE_SCALE_RULES
+    applied on top. Resolutions are memoized up to _GENRE_ALIASES_MAX keys.
+    """
+    profile = GENRE_REGISTRY.get(genre_key)
+    if profile is not None:
+        return profile
+    profile = _GENRE_ALIASES.get(genre_key)
+    if profile is None:
+        matches = [k for k in GENRE_REGISTRY if k != "default" and k in genre_key]
+        profile = GENRE_REGISTRY[max(matches, key=len) if matches else "default"]
+        if not profile["scale"]:
+            scale = next((name for part, name in _GENRE_SCALE_RULES if part in genre_key), None)
+            if scale:
+                profile = dict(profile, scale=scale)
+        if len(_GENRE_ALIASES) < _GENRE_ALIASES_MAX:
+            _GENRE_ALIASES[genre_key] = profile
+    return profile
+
+
+def genre_menu():
+    """Category -> [(subgenre label, genre key), ...] for UI selectors, in registry order."""
+    menu = {}
+    for key, profile in GENRE_REGISTRY.items():
+        if profile["category"]:
+            menu.setdefault(profile["category"], []).append((profile["label"], key))
+    return menu
+
+
+# -------------------------
+# Native Standard MIDI File writer
+# -------------------------
+# Writes format-1 SMF bytes straight from sorted EventBlock tick arrays: delta-time
+# varints, running status (every note message shares one note-on status byte) and
+# note-on with velocity 0 as note-off. No pretty_midi/mido objects are created.
+DRUM_CHANNEL = 9
+
+
+def _varint(value):
+    """Encode one MIDI variable-length quantity."""
+    out = [value & 0x7F]
+    value >>= 7
+    while value:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    return bytes(reversed(out))
+
+
+def _meta(meta_type, data):
+    return b"\x00\xff" + bytes([meta_type]) + _varint(len(data)) + data
+
+
+def _chunk(kind, data):
+    return kind + len(data).to_bytes(4, "big") + data
+
+
+def _note_messages(block):
+    """
+    Return (tick, pitch, velocity) arrays of note-on/note-off messages for a block,
+    ordered by tick with note-offs before note-ons at the same tick.
+    """
+    n = len(block)
+    tick = np.concatenate([block.tick.astype(np.int64) + block.dur, block.tick.astype(np.int64)])
+    pitch = np.concatenate([block.pitch, block.pitch])
+    vel = np.concatenate([np.zeros(n, dtype=np.uint8), np.maximum(block.vel, 1)])
+    order = np.argsort(tick, kind="stable")  # offs come first in the concatenation
+    return tick[order], pitch[order], vel[order]
+
+
+def _encode_note_stream(tick, pitch, vel, status, last_tick=0):
+    """
+    Vectorized encoding of note messages with running status: each message is
+    varint(delta) + pitch + velocity, and only the first one carries `status`
+    (pass status=None to continue a stream whose status byte was already sent).
+    """
+    if len(tick) == 0:
+        return b""
+    delta = np.diff(tick, prepend=last_tick)
+    nbytes = 1 + (delta >= 1 << 7) + (delta >= 1 << 14) + (delta >= 1 << 21)
+    rec_len = nbytes + 2
+    offsets = np.cumsum(rec_len) - rec_len
+    buf = np.empty(int(rec_len.sum()), dtype=np.uint8)
+    for k in range(4):
+        m = nbytes > k
+        byte = (delta[m] >> (7 * k)) & 0x7F
+        if k:
+            byte |= 0x80
+        buf[offsets[m] + nbytes[m] - 1 - k] = byte
+    buf[offsets + nbytes] = pitch
+    buf[offsets + nbytes + 1] = vel
+    data = buf.tobytes()
+    if status is None:
+        return data
+    first = int(nbytes[0])
+    return data[:first] + bytes([status]) + data[first:]
+
+
+def _tempo_track(bpm):
+    tempo = int(round(60000000.0 / bpm))
+    data = _meta(0x51, tempo.to_bytes(3, "big"))
+    data += _meta(0x58, bytes([4, 2, 24, 8]))  # 4/4
+    return _chunk(b"MTrk", data + _meta(0x2F, b""))
+
+
+def _channel_for(index, is_drum):
+    """Drums go to channel 10; melodic tracks take the remaining channels in order."""
+    if is_drum:
+        return DRUM_CHANNEL
+    return index if index < DRUM_CHANNEL else index + 1
+
+
+def _track_prelude(name, program, channel):
+    """Track name and program change at tick 0."""
+    return _meta(0x03, name.encode("utf-8")) + b"\x00" + bytes([0xC0 | channel, program & 0x7F])
+
+
+def _note_track(name, program, channel, block):
+    data = _track_prelude(name, program, channel)
+    tick, pitch, vel = _note_messages(block)
+    data += _encode_note_stream(tick, pitch, vel, 0x90 | channel)
+    return _chunk(b"MTrk", data + _meta(0x2F, b""))
+
+
+def write_smf(tracks, bpm, ppq=PPQ):
+    """
+    Encode tracks as a format-1 Standard MIDI File and return the bytes.
+    tracks: iterable of (name, program, is_drum, EventBlock) with blocks on the tick timeline.
+    """
+    chunks = [_tempo_track(bpm)]
+    melodic = 0
+    for name, program, is_drum, block in tracks:
+        chunks.append(_note_track(name, program, _channel_for(melodic, is_drum), block))
+        if not is_drum:
+            melodic += 1
+    return _smf_header(len(chunks), ppq) + b"".join(chunks)
+
+
+def _smf_header(n_tracks, ppq):
+    return _chunk(b"MThd", (1).to_bytes(2, "big") + int(n_tracks).to_bytes(2, "big") + int(ppq).to_bytes(2, "big"))
+
+
+def _write_note_track_stream(out, name, program, channel, blocks):
+    """
+    Write one MTrk chunk from an iterator of ordered EventBlocks. Note-offs that fall
+    after the last onset seen so far are carried to the next block, so only one block
+    and the currently sounding notes are held; the chunk length is back-patched.
+    """
+    start = out.tell()
+    out.write(b"MTrk\x00\x00\x00\x00")
+    out.write(_track_prelude(name, program, channel))
+    status = 0x90 | channel
+    last_tick = 0
+    off_tick = np.empty(0, dtype=np.int64)
+    off_pitch = np.empty(0, dtype=np.uint8)
+    for block in blocks:
+        if not len(block):
+            continue
+        on_tick = block.tick.astype(np.int64)
+        if on_tick[0] < last_tick:
+            raise ValueError("streamed blocks must be ordered by tick")
+        horizon = on_tick[-1]
+        n_off = len(off_tick) + len(block)
+        tick = np.concatenate([off_tick, on_tick + block.dur, on_tick])
+        pitch = np.concatenate([off_pitch, block.pitch, block.pitch])
+        vel = np.concatenate([np.zeros(n_off, dtype=np.uint8), np.maximum(block.vel, 1)])
+        order = np.argsort(tick, kind="stable")  # offs come first in the concatenation
+        tick, pitch, vel = tick[order], pitch[order], vel[order]
+        ready = (tick <= horizon) | (vel > 0)
+        out.write(_encode_note_stream(tick[ready], pitch[ready], vel[ready], status, last_tick))
+        status = None
+        last_tick = int(tick[ready][-1])
+        off_tick, off_pitch = tick[~ready], pitch[~ready]
+    if len(off_tick):
+        out.write(_encode_note_stream(off_tick, off_pitch, np.zeros(len(off_tick), dtype=np.uint8), status, last_tick))
+    out.write(_meta(0x2F, b""))
+    end = out.tell()
+    out.seek(start + 4)
+    out.write((end - start - 8).to_bytes(4, "big"))
+    out.seek(end)
+
+
+def write_smf_stream(target, tracks, bpm, ppq=PPQ):
+    """
+    Stream a format-1 Standard MIDI File to `target` (a path or a seekable binary buffer)
+    and return the target. tracks: sequence of (name, program, is_drum, blocks) where
+    blocks is any iterable of tick-ordered EventBlocks (e.g. a stream_*_events generator);
+    each track is consumed and written one block at a time, so memory stays flat.
+    """
+    if not hasattr(target, "write"):
+        with open(target, "wb") as f:
+            write_smf_stream(f, tracks, bpm, ppq)
+        return target
+    tracks = list(tracks)
+    target.write(_smf_header(len(tracks) + 1, ppq))
+    target.write(_tempo_track(bpm))
+    melodic = 0
+    for name, program, is_drum, blocks in tracks:
+        if isinstance(blocks, EventBlock):
+            blocks = (blocks,)
+        _write_note_track_stream(target, name, program, _channel_for(melodic, is_drum), blocks)
+        if not is_drum:
+            melodic += 1
+    return target
+
+
+# -------------------------
+# Export result cache
+# -------------------------
+# Seeded exports are pure functions of their inputs, so the MIDI bytes are stored
+# under a hash of those inputs: an in-memory LRU tier, plus an optional directory
+# tier (shared between processes) trimmed to a byte budget, oldest files first.
+_EXPORT_CACHE = OrderedDict()
+_EXPORT_CACHE_LOCK = threading.Lock()
+_EXPORT_CACHE_CONFIG = {"max_entries": 256, "disk_dir": None, "disk_max_bytes": 64 * 1024 * 1024}
+
+
+def configure_export_cache(max_entries=None, disk_dir=False, disk_max_bytes=None):
+    """
+    Tune the export cache. max_entries bounds the memory tier (0 disables it);
+    disk_dir enables the disk tier in that directory (None disables it);
+    disk_max_bytes bounds the disk tier. Omitted arguments keep their current value.
+    """
+    with _EXPORT_CACHE_LOCK:
+        if max_entries is not None:
+            _EXPORT_CACHE_CONFIG["max_entries"] = int(max_entries)
+            while len(_EXPORT_CACHE) > _EXPORT_CACHE_CONFIG["max_entries"]:
+                _EXPORT_CACHE.popitem(last=False)
+        if disk_dir is not False:
+            if disk_dir is not None:
+                os.makedirs(disk_dir, exist_ok=True)
+            _EXPORT_CACHE_CONFIG["disk_dir"] = disk_dir
+        if disk_max_bytes is not None:
+            _EXPORT_CACHE_CONFIG["disk_max_bytes"] = int(disk_max_bytes)
+
+
+def clear_export_cache():
+    """Drop every entry of the memory tier (the disk tier is left alone)."""
+    with _EXPORT_CACHE_LOCK:
+        _EXPORT_CACHE.clear()
+
+
+def _cache_key_default(value):
+    """json.dumps hook for cache keys: numpy values by content, anything else is an error."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()  # repr/str abbreviate long arrays, so never stringify them
+    if isinstance(value, np.generic):
+        return value.item()  # np.int64(120) keys like 120
+    raise TypeError("cannot build an export cache key from %s" % type(value).__name__)
+
+
+def _export_cache_key(plan, seed=None, **options):
+    """
+    Canonical hash of everything that shapes an export, or None when the request is
+    not cacheable: unseeded, or holding values the key cannot represent exactly.
+    """
+    try:
+        seed = _seed_entropy(seed) if seed else 0
+    except (TypeError, ValueError):
+        return None
+    if not seed:
+        return None
+    plan = {k: plan.get(k) for k in ("genre", "bpm", "mood", "energy")}
+    try:
+        if np.ndim(plan["energy"]):
+            # Key a curve by the levels the export uses, so lists, tuples and arrays agree
+            plan["energy"] = _energy_levels(plan["energy"]).tolist()
+        inputs = {
+            "plan": plan,
+            "seed": seed,
+            "options": options,
+        }
+        canonical = json.dumps(inputs, sort_keys=True, separators=(",", ":"), default=_cache_key_default)
+    except (TypeError, ValueError):
+        return None  # the export itself may still be valid; it just is not cached
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _export_cache_get(key):
+    with _EXPORT_CACHE_LOCK:
+        data = _EXPORT_CACHE.get(key)
+        if data is not None:
+            _EXPORT_CACHE.move_to_end(key)
+            return data
+        disk_dir = _EXPORT_CACHE_CONFIG["disk_dir"]
+    if disk_dir is None:
+        return None
+    path = os.path.join(disk_dir, key + ".mid")
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        os.utime(path)  # refresh recency for eviction
+    except OSError:
+        return None
+    if not _smf_complete(data):
+        return None  # empty or truncated (e.g. written by an older or crashed process): a miss
+    _export_cache_put(key, data, disk=False)
+    return data
+
+
+def _smf_complete(data):
+    """True when data is a header chunk plus chunks whose lengths add up to exactly len(data)."""
+    if not data.startswith(b"MThd"):
+        return False
+    pos = 0
+    while pos + 8 <= len(data):
+        pos += 8 + int.from_bytes(data[pos + 4:pos + 8], "big")
+    return pos == len(data)
+
+
+def _export_cache_put(key, data, disk=True):
+    with _EXPORT_CACHE_LOCK:
+        max_entries = _EXPORT_CACHE_CONFIG["max_entries"]
+        if max_entries > 0:
+            _EXPORT_CACHE[key] = data
+            _EXPORT_CACHE.move_to_end(key)
+            while len(_EXPORT_CACHE) > max_entries:
+                _EXPORT_CACHE.popitem(last=False)
+        disk_dir = _EXPORT_CACHE_CONFIG["disk_dir"]
+        disk_max_bytes = _EXPORT_CACHE_CONFIG["disk_max_bytes"]
+    if disk and disk_dir is not None:
+        tmp = None
+        try:
+            # A unique temp file per write (threads of one process share a pid), then an
+            # atomic rename, so concurrent readers never see partial files
+            fd, tmp = tempfile.mkstemp(dir=disk_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, os.path.join(disk_dir, key + ".mid"))
+            tmp = None
+            _trim_disk_cache(disk_dir, disk_max_bytes)
+        except OSError:
+            pass
+        finally:
+            if tmp is not None:
+                try:
+                    os.remove(tmp)
+                except OSError:
+                    pass
+
+
+def _trim_disk_cache(disk_dir, max_bytes):
+    entries = []
+    for entry in os.scandir(disk_dir):
+        if entry.name.endswith(".mid"):
+            try:
+                st = entry.stat()
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+
+
+# -------------------------
+# Stage profiling (export_midi(profile=...))
+# -------------------------
+class _StageTimer:
+    """
+    Records wall time, event count and allocations of every export stage it runs.
+    sink: a dict filled with {stage: {"wall_s", "events", "alloc_bytes", "calls"}} (a stage
+    that runs more than once accumulates), or a callable called as sink(stage, stats) per run.
+    alloc_bytes is the stage's peak traced allocation while tracemalloc is tracing, else None.
+    """
+    __slots__ = ("sink", "tracing")
+
+    def __init__(self, sink):
+        if not (isinstance(sink, dict) or callable(sink)):
+            raise TypeError("profile must be a dict or a callable")
+        self.sink = sink
+        self.tracing = tracemalloc.is_tracing()
+
+    def run(self, stage, fn, *args, **kwargs):
+        if self.tracing:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        wall_s = time.perf_counter() - start
+        alloc_bytes = tracemalloc.get_traced_memory()[1] - before if self.tracing else None
+        self.record(stage, wall_s, _event_count(result), alloc_bytes)
+        return result
+
+    def record(self, stage, wall_s, events=None, alloc_bytes=None):
+        if not isinstance(self.sink, dict):
+            self.sink(stage, {"wall_s": wall_s, "events": events, "alloc_bytes": alloc_bytes})
+            return
+        entry = self.sink.setdefault(stage, {"wall_s": 0.0, "events": None, "alloc_bytes": None, "calls": 0})
+        entry["wall_s"] += wall_s
+        entry["calls"] += 1
+        if events is not None:
+            entry["events"] = (entry["events"] or 0) + events
+        if alloc_bytes is not None:
+            entry["alloc_bytes"] = max(entry["alloc_bytes"] or 0, alloc_bytes)
+
+
+def _event_count(result):
+    """Events in a stage result (block, quantized layer, (block, groove) or track list), else None."""
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, EventBlock):
+        return len(result)
+    if isinstance(result, dict) and ("events" in result or "tick" in result):
+        return len(result["events"] if "events" in result else result["tick"])
+    if isinstance(result, list) and all(isinstance(track, tuple) and len(track) == 4 for track in result):
+        return sum(len(track[3]) for track in result)
+    return None
+
+
+def _timed(timer, stage, fn, *args, **kwargs):
+    """Call fn, recorded as `stage` when profiling (timer is None otherwise: a plain call)."""
+    if timer is None:
+        return fn(*args, **kwargs)
+    return timer.run(stage, fn, *args, **kwargs)
 
 
 # -------------------------
 # Main export_midi (advanced)
 # -------------------------
-def export_midi(plan, filename="beat_skeleton_advanced.mid", include_bass=True, include_melody=True, bars=8, break_preset="amen", snare_snap=False, hat_layout="standard", humanize_intensity=0.6, seed=None, lofi_vinyl=False):
+def export_midi(plan, filename="beat_skeleton_advanced.mid", include_bass=True, include_melody=True, bars=8, break_preset="amen", snare_snap=False, hat_layout="standard", humanize_intensity=0.6, seed=None, lofi_vinyl=False, writer="native", cache=True, streaming=False, chunk_bars=4, parallel=False, arrange=False, profile=None):
     """
     Exports a pro-level MIDI file based on the 'plan' dict.
-    plan should contain: 'genre', 'bpm', 'mood', 'energy'
+    plan should contain: 'genre', 'bpm', 'mood', 'energy' (1..10, or a per-bar list of
+    levels for an energy curve; the tempo then follows its mean)
+    filename: a path (returned after writing), a writable binary buffer (returned after
+              writing), or None to get the MIDI file as bytes with no filesystem access.
+    seed: any int (negative too) reproduces the same export; None or 0 gives a fresh
+          take each call; a value int() cannot convert raises.
+    writer: "native" encodes the SMF directly from the event arrays (no extra dependencies);
+            "pretty_midi" builds a PrettyMIDI object and lets it write the file.
+    cache: serve/store the MIDI bytes of seeded requests in the export cache
+           (see configure_export_cache); unseeded requests are never cached.
+    streaming: generate chunk_bars bars at a time and stream them into the file with
+               write_smf_stream, so memory stays flat for very long exports (native
+               writer only, never cached; same notes as the in-memory export).
+    parallel: split every track into bar ranges and generate them concurrently on a
+              shared process pool (same output; worth it for long exports only - shorter
+              ones, or a single worker, fall back to sequential; see configure_track_pool).
+              The pool spawns fresh interpreters that re-import your main module, so a
+              script calling this must sit under `if __name__ == "__main__":`.
+    arrange: render plan["structure"] as a full arrangement of `bars`-bar sections
+             (see arrange_sections) instead of a single loop; cannot be streamed. With
+             an energy curve each section follows its stretch of the curve.
+    profile: opt-in stage timings - a dict to fill, or a callback(stage, stats) - with wall
+             time, event count and (while tracemalloc is tracing) peak allocation of each
+             stage: drums, perc, bass, melody, humanize, notes, write (plus cache lookups;
+             parallel renders are one "render" stage, streamed exports one "stream" stage).
     """
-    if not HAS_MIDI:
-        raise ImportError("pretty_midi is not installed. Run: pip install pretty_midi")
+    if streaming and arrange:
+        raise ValueError("arranged exports cannot be streamed")
+    if writer == "pretty_midi":
+        if streaming:
+            raise ValueError("streaming export needs writer='native'")
+        _load_pretty_midi()
+
+    # Seeded requests are deterministic, so their bytes can be served from the cache
+    cache_key = None
+    if cache and not streaming:
+        cache_key = _export_cache_key(plan, include_bass=include_bass, include_melody=include_melody, bars=bars,
+                                      break_preset=break_preset, snare_snap=snare_snap, hat_layout=hat_layout,
+                                      humanize_intensity=humanize_intensity, seed=seed, lofi_vinyl=lofi_vinyl,
+                                      writer=writer, structure=plan.get("structure") if arrange else None)
+    timer = _StageTimer(profile) if profile is not None else None
+    if cache_key:
+        data = _timed(timer, "cache", _export_cache_get, cache_key)
+        if data is not None:
+            return _timed(timer, "write", _write_output, data, filename)
+
+    # Optional reproducibility seed: one generator per request, never the global RNG
+    rng = make_rng(seed)
+
+    setup = _export_setup(plan, include_bass, include_melody, bars, break_preset, snare_snap, hat_layout, humanize_intensity, lofi_vinyl)
+    eff_bpm = setup["eff_bpm"]
+    if streaming:
+        tracks = _stream_tracks(setup, rng, chunk_bars)
+        # Chunks of every stage interleave while streaming, so they are timed as one stage
+        out = _timed(timer, "stream", write_smf_stream, io.BytesIO() if filename is None else filename, tracks, eff_bpm)
+        return out.getvalue() if filename is None else out
+    if arrange:
+        tracks = _arrange_tracks(plan, rng, include_bass, include_melody, bars, break_preset, snare_snap, hat_layout,
+                                 humanize_intensity, lofi_vinyl, parallel=parallel, timer=timer)
+    else:
+        tracks = _render_tracks(setup, rng, parallel=parallel, timer=timer)
+
+    # finalize: all tracks share the tick timeline, tempo is applied only here
+    if writer == "pretty_midi":
+        pm = _timed(timer, "notes", _pretty_midi_object, tracks, eff_bpm)
+        buf = io.BytesIO()
+        _timed(timer, "write", pm.write, buf)
+        data = buf.getvalue()
+    else:
+        data = _timed(timer, "notes", write_smf, tracks, eff_bpm)
+    if cache_key:
+        _timed(timer, "cache", _export_cache_put, cache_key, data)
+    return _timed(timer, "write", _write_output, data, filename)
+
+
+def _pretty_midi_object(tracks, bpm):
+    """PrettyMIDI object holding the export tracks at the given tempo."""
+    pm = pretty_midi.PrettyMIDI(resolution=PPQ, initial_tempo=bpm)
+    for name, program, is_drum, block in tracks:
+        instrument = pretty_midi.Instrument(program=program, is_drum=is_drum, name=name)
+        pm.instruments.append(instrument)
+        _add_block(instrument, block, bpm)
+    return pm
 
+
+def effective_bpm(bpm, energy):
+    """Tempo stage: adjust the plan tempo slightly by energy (denser & faster feeling)."""
+    bpm_variation = int((energy - 5) * 0.6)  # energy 10 => +3 bpm approx
+    return max(40, int(bpm) + bpm_variation)
+
+
+def _export_setup(plan, include_bass=True, include_melody=True, bars=8, break_preset="amen", snare_snap=False, hat_layout="standard", humanize_intensity=0.6, lofi_vinyl=False):
+    """Deterministic part of an export: parsed plan, effective tempo and per-track setups."""
     genre = plan.get("genre", "default")
     bpm = int(plan.get("bpm", 120))
     mood = plan.get("mood", "neutral")
+    energy = plan.get("energy", 5)  # 1..10, or a per-bar energy curve
+    energy = _energy_levels(energy)
+
+    return {
+        "bpm": bpm,
+        "eff_bpm": effective_bpm(bpm, _mean_energy(energy)),
+        "energy": energy,
+        "bars": bars,
+        "drums": _drum_setup(plan["genre"], plan["energy"], bars, break_preset, snare_snap, hat_layout, humanize_intensity, lofi_vinyl),
+        "bass": _bass_setup(genre, energy, bars, mood, humanize_intensity) if include_bass else None,
+        "melody": _melody_setup(genre, energy, bars, mood) if include_melody else None,
+    }
 
-    # Optional reproducibility seed
-    if seed is not None and seed != 0:
-        try:
-            random.seed(int(seed))
-        except Exception:
-            pass
-    energy = int(plan.get("energy", 5))
 
-    # Adjust effective BPM slightly by energy (denser & faster feeling)
-    bpm_variation = int((energy - 5) * 0.6)  # energy 10 => +3 bpm approx
-    eff_bpm = max(40, bpm + bpm_variation)
-
-    pm = pretty_midi.PrettyMIDI(initial_tempo=eff_bpm)
-
-    # Drums
-    drum_instrument = pretty_midi.Instrument(program=0, is_drum=True, name="Drums")
-    pm.instruments.append(drum_instrument)
-
-    # Percussive textures
-    perc_instrument = pretty_midi.Instrument(program=120, is_drum=False, name="PercTextures")
-    pm.instruments.append(perc_instrument)
-
-    # Generate drum events
-    drum_events = generate_drum_events(
-        plan["genre"], plan["bpm"], energy=plan["energy"], bars=bars,
-        break_preset=break_preset, snare_snap=snare_snap, hat_layout=hat_layout,
-        humanize_intensity=humanize_intensity, lofi_vinyl=lofi_vinyl
-    )
-    for t, pitch, vel, dur in drum_events:
-        add_note(drum_instrument, pitch, t, dur, vel)
-
-    # Perc textures (atmosphere)
-    if energy >= 6:
-        for _ in range(int(bars * 2)):
-            t = random.uniform(0, (bars * 4) * (60.0 / eff_bpm))
-            add_note(perc_instrument, random.choice([70, 71, 72, 73, 74]), t, 0.06, velocity_for(0.4))
-
-    # Bass
-    if include_bass:
-        bass_instrument = pretty_midi.Instrument(program=34, is_drum=False, name="Bass")
-        pm.instruments.append(bass_instrument)
-        bass_events = generate_bass_events(genre, eff_bpm, energy=energy, bars=bars, mood=mood, humanize_intensity=humanize_intensity)
-        for t, pitch, vel, dur in bass_events:
-            add_note(bass_instrument, pitch, t, dur, vel)
-
-    # Melody (optional)
-    if include_melody:
-        melody_inst = pretty_midi.Instrument(program=81, is_drum=False, name="Melody")  # Lead 2 (sawtooth)
-        pm.instruments.append(melody_inst)
-        melody_events = generate_melody_events(genre, eff_bpm, energy=energy, bars=bars, mood=mood, humanize_intensity=humanize_intensity)
-        for t, pitch, vel, dur in melody_events:
-            add_note(melody_inst, pitch, t, dur, vel)
-
-    # finalize
-    pm.write(filename)
-    return filename
+def _sample_perc(energy, key, first_bar, bars):
+    """Atmospheric perc textures: two random hits somewhere in each bar at energy 6 and up."""
+    perc_events = []
+    active = (_bar_energies(energy, first_bar, bars) >= 6).tolist()
+    if any(active):
+        for (bar, rng), on in zip(_bar_randoms(key, first_bar, bars), active):
+            for _ in range(2 if on else 0):
+                t = (bar * 4 + rng.uniform(0, 4)) * PPQ
+                perc_events.append((t, rng.choice([70, 71, 72, 73, 74]), velocity_for(0.4), 0.06 * _REF_TICKS_PER_SECOND))
+    return EventBlock.from_tuples(perc_events).sorted()
+
+
+def _render_keys(rng):
+    """Per-track keys of one render, always drawn in TRACKS order (so toggling a track changes nothing else)."""
+    return {track: track_key(rng, track) for track in TRACKS}
+
+
+_TRACK_LAYOUT = {  # track -> (name, program, is_drum, setup entry)
+    "drums": ("Drums", 0, True, "drums"),
+    "perc": ("PercTextures", 120, False, "energy"),
+    "bass": ("Bass", 34, False, "bass"),
+    "melody": ("Melody", 81, False, "melody"),  # Lead 2 (sawtooth)
+}
+_TRACK_POOL = None
+_TRACK_POOL_LOCK = threading.Lock()
+# max_workers: worker processes (and bar ranges per track), None = os.cpu_count()
+# executor: caller-owned executor used instead of the built-in pool
+# min_bars: shorter renders stay sequential - pool round-trips outweigh the work
+_TRACK_POOL_CONFIG = {"max_workers": None, "executor": None, "min_bars": 512}
+
+
+def configure_track_pool(max_workers=None, executor=False, min_bars=None):
+    """
+    Tune parallel track generation (export_midi(parallel=True)). max_workers sizes the
+    built-in pool and the number of bar ranges per track; executor supplies your own
+    concurrent.futures executor (its lifetime is yours; None goes back to the built-in
+    pool); min_bars is the shortest render that is split at all.
+    Omitted arguments keep their current value.
+    """
+    global _TRACK_POOL
+    with _TRACK_POOL_LOCK:
+        if max_workers is not None:
+            _TRACK_POOL_CONFIG["max_workers"] = max(1, int(max_workers))
+            if _TRACK_POOL is not None:
+                _TRACK_POOL.shutdown(wait=False)
+                _TRACK_POOL = None
+        if executor is not False:
+            _TRACK_POOL_CONFIG["executor"] = executor
+        if min_bars is not None:
+            _TRACK_POOL_CONFIG["min_bars"] = int(min_bars)
+
+
+def _track_pool_workers():
+    return _TRACK_POOL_CONFIG["max_workers"] or os.cpu_count() or 1
+
+
+def _shutdown_track_pool():
+    global _TRACK_POOL
+    with _TRACK_POOL_LOCK:
+        if _TRACK_POOL is not None:
+            _TRACK_POOL.shutdown(wait=True, cancel_futures=True)
+            _TRACK_POOL = None
+
+
+atexit.register(_shutdown_track_pool)
+
+
+def _track_pool():
+    """Worker pool for parallel track generation: the caller's executor, or a process-wide pool created on first use."""
+    global _TRACK_POOL
+    with _TRACK_POOL_LOCK:
+        if _TRACK_POOL_CONFIG["executor"] is not None:
+            return _TRACK_POOL_CONFIG["executor"]
+        if _TRACK_POOL is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            # spawn, not fork: callers (e.g. the Streamlit server) are multi-threaded
+            _TRACK_POOL = ProcessPoolExecutor(max_workers=_track_pool_workers(), mp_context=multiprocessing.get_context("spawn"))
+    return _TRACK_POOL
+
+
+def _sample_track(track, track_setup, key, first_bar, bars, groove=None):
+    """Sample one track over a bar range: drums return (events, groove), bass and melody lock to groove."""
+    if track == "drums":
+        return _sample_drums(track_setup, key, first_bar, bars, with_groove=True)
+    if track == "perc":
+        return _sample_perc(track_setup, key, first_bar, bars)
+    if track == "bass":
+        return _sample_bass(track_setup, key, first_bar, bars, groove=groove)
+    return _sample_melody(track_setup, key, first_bar, bars, groove=groove)
+
+
+def _render_tracks(setup, rng, first_bar=0, parallel=False, timer=None):
+    """
+    Stochastic part of an export: sample every track of a prepared setup (bars from first_bar).
+    Every track draws only from its own key and every bar only from its own counters, so
+    with parallel=True each track is split into bar ranges that run concurrently on the
+    worker pool; the merged result is identical to the sequential one. Renders shorter
+    than the pool's min_bars, or with a single worker, stay sequential.
+    timer: optional _StageTimer recording each stage (a parallel render is one "render" stage).
+    """
+    if parallel and timer is not None:
+        return timer.run("render", _render_tracks, setup, rng, first_bar, parallel=True)
+    keys = _render_keys(rng)
+    bars = setup["bars"]
+    workers = _track_pool_workers()
+    if not parallel or workers == 1 or bars < _TRACK_POOL_CONFIG["min_bars"]:
+        return _humanize_tracks(setup, _quantize_tracks(setup, keys, first_bar, timer), timer=timer)
+
+    tracks = [track for track in TRACKS if setup[_TRACK_LAYOUT[track][3]] is not None]
+
+    def args(track, lo, hi):
+        return track, setup[_TRACK_LAYOUT[track][3]], keys[track], lo, hi - lo
+
+    pool = _track_pool()
+    n_chunks = max(1, min(bars, workers))
+    edges = [first_bar + bars * i // n_chunks for i in range(n_chunks + 1)]
+    ranges = list(zip(edges[:-1], edges[1:]))
+    futures = {"drums": [pool.submit(_sample_track, *args("drums", lo, hi)) for lo, hi in ranges],
+               "perc": [pool.submit(_sample_track, *args("perc", lo, hi)) for lo, hi in ranges]}
+    # Bass/melody ranges start as soon as the drums of the same range are done
+    for track in tracks[2:]:
+        futures[track] = []
+    for (lo, hi), drum_future in zip(ranges, futures["drums"]):
+        groove = drum_future.result()[1]
+        for track in tracks[2:]:
+            futures[track].append(pool.submit(_sample_track, *args(track, lo, hi), groove))
+    # Bar-range blocks are each sorted and in bar order, so merging them restores the sequential order
+    blocks = {track: [f.result() for f in fs] for track, fs in futures.items()}
+    blocks["drums"] = [drums for drums, _ in blocks["drums"]]
+    return [_TRACK_LAYOUT[track][:3] + (EventBlock.merge(blocks[track]),) for track in tracks]
+
+
+def _quantize_tracks(setup, keys, first_bar=0, timer=None):
+    """
+    Quantized stage of a render: every track before swing/humanization, with its humanize draws.
+    Bass note choices only depend on how many kicks each bar has, and melody only on the
+    groove's swing and energy, so none of it changes with humanize_intensity.
+    """
+    bars = setup["bars"]
+    # Drums first: their groove context drives bass and melody
+    drums = _timed(timer, "drums", _quantize_drums, setup["drums"], keys["drums"], first_bar, bars)
+    groove = _groove_context(drums["events"], drums["bar"], setup["drums"], first_bar, bars)
+    quantized = {"drums": drums, "perc": _timed(timer, "perc", _sample_perc, setup["energy"], keys["perc"], first_bar, bars)}
+    if setup["bass"] is not None:
+        kick_counts = [len(kicks) for kicks in _groove_onsets(groove, "kick", first_bar, bars)]
+        quantized["bass"] = _timed(timer, "bass", _quantize_bass, setup["bass"], keys["bass"], first_bar, bars,
+                                   kick_counts=kick_counts)
+    if setup["melody"] is not None:
+        quantized["melody"] = _timed(timer, "melody", _sample_melody, setup["melody"], keys["melody"], first_bar, bars,
+                                     groove=groove)
+    return quantized
+
+
+def _humanize_tracks(setup, quantized, humanize_intensity=None, timer=None):
+    """Swing + humanization stage over a quantized render; returns the export track list."""
+    drums, groove = _timed(timer, "humanize", _humanize_drums, setup["drums"], quantized["drums"], humanize_intensity,
+                           with_groove=True)
+    blocks = {"drums": drums, "perc": quantized["perc"], "melody": quantized.get("melody")}
+    if "bass" in quantized:
+        blocks["bass"] = _timed(timer, "humanize", _humanize_bass, setup["bass"], quantized["bass"], groove, humanize_intensity)
+    return [_TRACK_LAYOUT[track][:3] + (blocks[track],) for track in TRACKS if track in quantized]
+
+
+def _stream_tracks(setup, rng, chunk_bars=4, first_bar=0):
+    """Like _render_tracks (and with the same events), but every track is a lazy stream of bar chunks."""
+    keys = _render_keys(rng)
+    bars = setup["bars"]
+
+    # Tracks are written one after another, so bass and melody re-derive the drum groove
+    # of each chunk from the drum counters instead of holding every chunk's groove
+    def groove_for(first, n):
+        return _sample_drums(setup["drums"], keys["drums"], first, n, with_groove=True)[1]
+
+    tracks = [
+        ("Drums", 0, True, _drum_stream(setup["drums"], keys["drums"], bars, chunk_bars, first_bar)),
+        ("PercTextures", 120, False,
+         _ordered_stream(lambda first, n: _sample_perc(setup["energy"], keys["perc"], first, n), bars, chunk_bars, first_bar)),
+    ]
+    if setup["bass"] is not None:
+        tracks.append(("Bass", 34, False, _bass_stream(setup["bass"], keys["bass"], bars, chunk_bars, first_bar, groove_for)))
+    if setup["melody"] is not None:
+        tracks.append(("Melody", 81, False, _melody_stream(setup["melody"], keys["melody"], bars, chunk_bars, first_bar, groove_for)))
+    return tracks
+
+
+def generate_variations(plan, n, seed=None, include_bass=True, include_melody=True, bars=8, break_preset="amen", snare_snap=False, hat_layout="standard", humanize_intensity=0.6, lofi_vinyl=False, as_midi=False):
+    """
+    Generate n variations of one plan, sharing all deterministic work.
+    The plan is parsed, the drum grid compiled and the bass/melody tables built once;
+    only the stochastic layers are sampled per variation, each from its own child
+    stream of `seed` (so variation i is reproducible on its own).
+    Returns a list of n dicts {track name: EventBlock}, or n MIDI byte strings if as_midi.
+    """
+    setup = _export_setup(plan, include_bass, include_melody, bars, break_preset, snare_snap, hat_layout, humanize_intensity, lofi_vinyl)
+    streams = np.random.SeedSequence(_seed_entropy(seed) if seed else None).spawn(int(n))
+    results = []
+    for stream in streams:
+        tracks = _render_tracks(setup, np.random.default_rng(stream))
+        if as_midi:
+            results.append(write_smf(tracks, setup["eff_bpm"]))
+        else:
+            results.append({name: block for name, _, _, block in tracks})
+    return results
+
+
+# -------------------------
+# Arrangement (plan["structure"] -> timeline of sections)
+# -------------------------
+_SECTION_PROFILES = {  # section name -> (energy offset from the plan, tracks that play)
+    "intro": (-2, ("drums", "perc")),
+    "build": (-1, ("drums", "perc", "bass")),
+    "verse": (0, ("drums", "perc", "bass")),
+    "drop": (1, TRACKS),
+    "chorus": (1, TRACKS),
+    "breakdown": (-3, ("perc", "melody")),
+    "bridge": (-2, ("drums", "melody")),
+    "outro": (-2, ("drums", "bass")),
+}
+_DEFAULT_SECTION = (0, TRACKS)
+
+
+def arrange_sections(plan, bars=8):
+    """
+    Timeline of plan["structure"]: one dict per section with name, start_bar, bars,
+    energy (plan energy + the section's offset, 1..10) and layers (tracks that play).
+    With an energy curve, a section's energy is the list of per-bar levels of the
+    curve over that section, each shifted by the offset.
+    Entries are section names, or dicts with a "name" and optional "bars", "energy"
+    and "layers" overrides. A plan without a structure is one plain section.
+    """
+    energy = _energy_levels(plan.get("energy", 5))
+    sections = []
+    start_bar = 0
+    for entry in plan.get("structure") or ["Main"]:
+        spec = entry if isinstance(entry, dict) else {"name": entry}
+        name = str(spec.get("name", "Main"))
+        offset, layers = _SECTION_PROFILES.get(name.strip().lower(), _DEFAULT_SECTION)
+        section_bars = int(spec.get("bars", bars))
+        if "energy" in spec:
+            section_energy = _energy_levels(spec["energy"])
+        elif np.ndim(energy):
+            section_energy = _energy_levels(_bar_energies(energy, start_bar, section_bars) + offset).tolist()
+        else:
+            section_energy = _energy_levels(energy + offset)
+        section = {
+            "name": name,
+            "start_bar": start_bar,
+            "bars": section_bars,
+            "energy": section_energy,
+            "layers": tuple(spec.get("layers", layers)),
+        }
+        sections.append(section)
+        start_bar += section["bars"]
+    return sections
+
+
+def _arrange_tracks(plan, rng, include_bass=True, include_melody=True, bars=8, break_preset="amen", snare_snap=False, hat_layout="standard", humanize_intensity=0.6, lofi_vinyl=False, parallel=False, timer=None):
+    """
+    Render plan["structure"] as a full arrangement on one tick timeline. Every distinct
+    section pattern (energy + layers) is sampled once as a `bars`-bar loop, in order of
+    first appearance, and tiled over each section that uses it. A section following an
+    energy curve is rendered whole instead, so the curve is kept bar for bar.
+    """
+    included = {"drums": True, "perc": True, "bass": include_bass, "melody": include_melody}
+    bar_ticks = 4 * PPQ
+    patterns = {}
+    lanes = {track: [] for track in TRACKS}
+    for section in arrange_sections(plan, bars):
+        layers = tuple(track for track in TRACKS if track in section["layers"] and included[track])
+        energy = section["energy"]
+        loop_bars = bars if np.ndim(energy) == 0 else section["bars"]
+        pattern_key = (energy if np.ndim(energy) == 0 else tuple(energy), loop_bars, layers)
+        if pattern_key not in patterns:
+            # Masked-out drums are still sampled: their groove drives bass and melody
+            setup = _export_setup(dict(plan, energy=energy), "bass" in layers, "melody" in layers, loop_bars,
+                                  break_preset, snare_snap, hat_layout, humanize_intensity, lofi_vinyl)
+            names = {name: track for track, (name, _, _, _) in _TRACK_LAYOUT.items()}
+            patterns[pattern_key] = {names[name]: block for name, _, _, block in _render_tracks(setup, rng, parallel=parallel, timer=timer)}
+        loop = patterns[pattern_key]
+        loop_ticks = loop_bars * bar_ticks
+        section_ticks = section["bars"] * bar_ticks
+        for track in layers:
+            block = loop[track]
+            for offset in range(0, section_ticks, loop_ticks):
+                tile = block if section_ticks - offset >= loop_ticks else block[block.tick < section_ticks - offset]
+                lanes[track].append(tile.shifted(section["start_bar"] * bar_ticks + offset))
+    return [_TRACK_LAYOUT[track][:3] + (EventBlock.merge(lanes[track]),) for track in TRACKS if lanes[track]]
+
+
+# -------------------------
+# Re-humanizing takes
+# -------------------------
+# A take keeps a render's quantized events, so feel tweaks (humanize_intensity, bpm)
+# re-run only the swing/humanization and tempo stages instead of the whole export.
+def render_take(plan, seed=None, include_bass=True, include_melody=True, bars=8, break_preset="amen", snare_snap=False, hat_layout="standard", lofi_vinyl=False):
+    """
+    Quantized stage of export_midi: the pre-humanization events of every track plus
+    their humanize draws. Apply the later stages with humanize_take / export_take.
+    """
+    setup = _export_setup(plan, include_bass, include_melody, bars, break_preset, snare_snap, hat_layout, lofi_vinyl=lofi_vinyl)
+    return {"setup": setup, "quantized": _quantize_tracks(setup, _render_keys(make_rng(seed)))}
+
+
+def humanize_take(take, humanize_intensity=0.6):
+    """Swing + humanization stage of a take: [(name, program, is_drum, EventBlock), ...]."""
+    return _humanize_tracks(take["setup"], take["quantized"], humanize_intensity)
+
+
+def export_take(take, filename=None, humanize_intensity=0.6, bpm=None):
+    """
+    Humanize a take and write it as MIDI (native writer); bpm replaces the plan tempo
+    (energy adjustment re-applied). Same bytes as export_midi with the same options.
+    """
+    setup = take["setup"]
+    eff_bpm = setup["eff_bpm"] if bpm is None else effective_bpm(bpm, _mean_energy(setup["energy"]))
+    return _write_output(write_smf(humanize_take(take, humanize_intensity), eff_bpm), filename)
 
 
 # -------------------------
@@ -1204,9 +3224,81 @@ def generate_beat_plan(genre="techno", bpm=125, mood="neutral", energy=5, bars=8
 
 
 def save_plan_json(plan, filename="beat_plan.json"):
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(plan, f, indent=2)
-    return filename
+    """
+    Write the plan as JSON. filename may be a path, a writable buffer, or None to
+    return the UTF-8 encoded JSON bytes instead of touching the filesystem.
+    """
+    return _write_output(json.dumps(plan, indent=2).encode("utf-8"), filename)
+
+
+def _write_output(data, target):
+    """
+    Deliver encoded bytes: return them when target is None, write them to a
+    buffer (text buffers get decoded UTF-8) or to a file path and return the target.
+    """
+    if target is None:
+        return data
+    if hasattr(target, "write"):
+        target.write(data.decode("utf-8") if isinstance(target, io.TextIOBase) else data)
+        return target
+    with open(target, "wb") as f:
+        f.write(data)
+    return target
+
+
+# -------------------------
+# Batch export (process pool)
+# -------------------------
+def _batch_worker_init(warm_keys=()):
+    """
+    Warm a batch worker once: pull in pretty_midi (if installed) and build the genre
+    tables and compiled drum grids the batch will need, so jobs only sample.
+    """
+    if HAS_MIDI:
+        _load_pretty_midi()
+    for genre_key, energy_norm, break_preset, snare_snap, hat_layout, lofi_vinyl in warm_keys:
+        _drum_grid(genre_key, energy_norm, break_preset, snare_snap, hat_layout, lofi_vinyl)
+
+
+def _batch_export_job(job):
+    plan, seed, filename, options = job
+    return export_midi(plan, filename=filename, seed=seed, **options)
+
+
+def export_batch(plans, seeds=None, filenames=None, max_workers=None, chunksize=1, **options):
+    """
+    Export many plans over a process pool.
+    seeds: one seed per plan (None entries get fresh entropy). Each job owns its seed,
+           so results do not depend on worker count or scheduling.
+    filenames: optional path per plan; without it each result is the MIDI bytes.
+    options: any other export_midi keyword (bars, include_bass, writer, ...), shared by all jobs.
+             parallel=True is rejected: batch jobs already run in worker processes.
+    Returns the results in submission order.
+    Workers are spawned, not forked, so callers need an `if __name__ == "__main__":` guard.
+    """
+    if options.pop("parallel", False):
+        raise ValueError("export_batch jobs cannot use parallel=True; the batch is already parallel")
+    plans = list(plans)
+    seeds = [None] * len(plans) if seeds is None else list(seeds)
+    filenames = [None] * len(plans) if filenames is None else list(filenames)
+    if not len(plans) == len(seeds) == len(filenames):
+        raise ValueError("plans, seeds and filenames must have the same length")
+
+    warm_keys = {
+        (genre_profile(_genre_key(plan["genre"]))["key"], level,
+         options.get("break_preset", "amen"), bool(options.get("snare_snap", False)),
+         options.get("hat_layout", "standard"), bool(options.get("lofi_vinyl", False)))
+        for plan in plans
+        for level in np.unique(_energy_levels(plan["energy"])).tolist()
+    }
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    jobs = [(plan, seed, filename, options) for plan, seed, filename in zip(plans, seeds, filenames)]
+    # spawn, not fork: callers (e.g. the Streamlit server) are multi-threaded
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_batch_worker_init, initargs=(tuple(warm_keys),)) as pool:
+        return list(pool.map(_batch_export_job, jobs, chunksize=chunksize))
 
 
 # -------------------------
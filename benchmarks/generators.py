@@ -0,0 +1,132 @@
+# benchmarks/generators.py
+# Timings of the generators and exporters: every genre through generate_drum_events,
+# generate_bass_events, generate_melody_events and export_midi, plus scaling runs over
+# bar counts and energy levels. Results are JSON and can be checked against a baseline.
+# Usage: python benchmarks/generators.py [--suite all|genres|scaling] [--runs 5] [--quick]
+#            [--filter techno] [--json results.json] [--baseline baseline.json] [--threshold 0.15]
+# Exits with status 1 when a case is slower than the baseline by more than the threshold.
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np  # noqa: E402
+
+import beat_starter_core as core  # noqa: E402
+
+SEED = 1234
+SCALING_BARS = (8, 64, 512, 4096)
+SCALING_ENERGIES = (2, 5, 9)
+SCALING_GENRES = ("techno_peak", "drum_and_bass_neuro", "hiphop_boom_bap")
+
+
+def timeit(fn, runs=5, warmup=1):
+    """Median and best wall time (seconds) of fn() over `runs` calls after `warmup` calls."""
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {"median_s": statistics.median(times), "min_s": min(times), "runs": runs}
+
+
+def genre_cases(bars=8, energy=7):
+    """name -> callable: every genre through each generator and the full export."""
+    cases = {}
+    for genre in core.GENRE_REGISTRY:
+        plan = {"genre": genre, "bpm": 120, "mood": "dark", "energy": energy}
+        cases["genre/%s/drums" % genre] = lambda g=genre: core.generate_drum_events(g, 120, energy=energy, bars=bars, rng=SEED)
+        cases["genre/%s/bass" % genre] = lambda g=genre: core.generate_bass_events(g, 120, energy=energy, bars=bars, rng=SEED)
+        cases["genre/%s/melody" % genre] = lambda g=genre: core.generate_melody_events(g, 120, energy=energy, bars=bars, rng=SEED)
+        cases["genre/%s/export" % genre] = lambda p=plan: core.export_midi(p, None, bars=bars, seed=SEED, cache=False)
+    return cases
+
+
+def scaling_cases(bar_counts=SCALING_BARS, energies=SCALING_ENERGIES, genres=SCALING_GENRES):
+    """name -> callable: export_midi across bar counts and energy levels."""
+    cases = {}
+    for genre in genres:
+        for energy in energies:
+            plan = {"genre": genre, "bpm": 120, "mood": "dark", "energy": energy}
+            for bars in bar_counts:
+                cases["scaling/%s/e%d/bars%d" % (genre, energy, bars)] = (
+                    lambda p=plan, n=bars: core.export_midi(p, None, bars=n, seed=SEED, cache=False))
+    return cases
+
+
+def compare(results, baseline, threshold=0.15, noise_floor_s=5e-5):
+    """
+    Compare median times against a baseline run. Returns (regressions, improvements) as
+    lists of (name, baseline s, current s, ratio); differences under noise_floor_s are ignored.
+    """
+    regressions, improvements = [], []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        old, new = base["median_s"], result["median_s"]
+        if abs(new - old) < noise_floor_s or old <= 0:
+            continue
+        ratio = new / old
+        if ratio > 1 + threshold:
+            regressions.append((name, old, new, ratio))
+        elif ratio < 1 - threshold:
+            improvements.append((name, old, new, ratio))
+    return regressions, improvements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generator and exporter benchmarks")
+    parser.add_argument("--suite", choices=("all", "genres", "scaling"), default="all")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--bars", type=int, default=8, help="bars per genre case")
+    parser.add_argument("--quick", action="store_true", help="3 runs, scaling up to 512 bars")
+    parser.add_argument("--filter", default="", help="only cases whose name contains this")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare against the results in this file")
+    parser.add_argument("--threshold", type=float, default=0.15, help="allowed slowdown (0.15 = 15%%)")
+    parser.add_argument("--noise-floor-ms", type=float, default=0.05, help="ignore differences below this")
+    args = parser.parse_args()
+
+    runs = 3 if args.quick else args.runs
+    cases = {}
+    if args.suite in ("all", "genres"):
+        cases.update(genre_cases(args.bars))
+    if args.suite in ("all", "scaling"):
+        cases.update(scaling_cases(SCALING_BARS[:3] if args.quick else SCALING_BARS))
+    cases = {name: fn for name, fn in cases.items() if args.filter in name}
+
+    results = {}
+    for name, fn in cases.items():
+        results[name] = timeit(fn, runs)
+        print("%-48s median %9.3f ms  min %9.3f ms" % (name, results[name]["median_s"] * 1e3, results[name]["min_s"] * 1e3))
+
+    if args.json:
+        meta = {"python": platform.python_version(), "numpy": np.__version__, "machine": platform.machine(),
+                "cpus": os.cpu_count(), "runs": runs, "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        with open(args.json, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions, improvements = compare(results, baseline, args.threshold, args.noise_floor_ms / 1e3)
+        for label, rows in (("improvements", improvements), ("regressions", regressions)):
+            print("\n%d %s (threshold %.0f%%):" % (len(rows), label, args.threshold * 100))
+            for name, old, new, ratio in rows:
+                print("  %-48s %9.3f -> %9.3f ms  (x%.2f)" % (name, old * 1e3, new * 1e3, ratio))
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
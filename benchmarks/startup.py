@@ -0,0 +1,79 @@
+"""
+Cold-start cost of importing beat_starter_core, measured with `python -X importtime`.
+Usage: python benchmarks/startup.py [--runs 5] [--top 10] [--json startup.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def importtime(module, extra=""):
+    """Run one fresh interpreter with -X importtime; return (wall seconds, {module: cumulative us})."""
+    code = "import %s%s" % (module, extra)
+    start = time.perf_counter()
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=ROOT,
+                          capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        try:
+            _, cum, name = line[len("import time:"):].split("|")
+            cumulative[name.strip()] = int(cum)
+        except ValueError:
+            continue  # header line
+    return wall, cumulative
+
+
+def measure(module, extra="", runs=5):
+    walls, totals, last = [], [], {}
+    for _ in range(runs):
+        wall, cumulative = importtime(module, extra)
+        walls.append(wall)
+        totals.append(cumulative.get(module, 0))
+        last = cumulative
+    return {
+        "wall_s_median": statistics.median(walls),
+        "import_us_median": statistics.median(totals),
+        "pretty_midi_loaded": "pretty_midi" in last,
+        "top": sorted(last.items(), key=lambda kv: kv[1], reverse=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args()
+
+    scenarios = {
+        "import": ("beat_starter_core", ""),
+        "plan_json": ("beat_starter_core", "; beat_starter_core.save_plan_json(beat_starter_core.generate_beat_plan(), None)"),
+        "native_midi": ("beat_starter_core", "; beat_starter_core.export_midi(beat_starter_core.generate_beat_plan(), None, seed=1)"),
+    }
+    results = {}
+    for name, (module, extra) in scenarios.items():
+        result = measure(module, extra, args.runs)
+        results[name] = dict(result, top=result["top"][:args.top])
+        print("%-12s wall %.1f ms  import %.1f ms  pretty_midi loaded: %s" % (
+            name, result["wall_s_median"] * 1e3, result["import_us_median"] / 1e3, result["pretty_midi_loaded"]))
+    print("\nslowest imports (cumulative, us):")
+    for mod, cum in results["import"]["top"]:
+        print("  %8d  %s" % (cum, mod))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
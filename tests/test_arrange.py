@@ -0,0 +1,25 @@
+import pytest
+
+import beat_starter_core as core
+
+CURVE = [2, 4, 6, 8, 10, 9, 7, 5, 3, 1]
+
+
+@pytest.mark.parametrize("genre", ["techno_peak", "hiphop_boom_bap", "drum_and_bass_neuro"])
+@pytest.mark.parametrize("energy", [6, CURVE])
+@pytest.mark.parametrize("bars", [8, 12])
+def test_plan_without_structure_arranges_like_the_loop(genre, energy, bars):
+    plan = {"genre": genre, "bpm": 128, "mood": "dark", "energy": energy}
+    loop = core.export_midi(plan, None, bars=bars, seed=9, cache=False)
+    assert core.export_midi(plan, None, bars=bars, seed=9, cache=False, arrange=True) == loop
+
+
+def test_sections_follow_the_energy_curve():
+    plan = {"genre": "techno", "energy": CURVE, "structure": ["Intro", "Verse", {"name": "Drop", "bars": 4}]}
+    sections = core.arrange_sections(plan, bars=4)
+    assert [s["energy"] for s in sections] == [[1, 2, 4, 6], [10, 9, 7, 5], [4, 2, 2, 2]]
+
+
+def test_scalar_energy_sections_stay_scalar():
+    plan = {"genre": "techno", "energy": 6, "structure": ["Intro", "Drop", {"name": "Verse", "energy": 3.6}]}
+    assert [s["energy"] for s in core.arrange_sections(plan)] == [4, 7, 4]
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+import beat_starter_core as core
+
+GENRES = ["techno_peak", "hiphop_boom_bap", "drum_and_bass_classic", "jazz_swing"]
+CURVE = [3, 5, 9, 2, 7]
+
+
+def assert_same(a, b):
+    for field in ("tick", "pitch", "vel", "dur"):
+        np.testing.assert_array_equal(getattr(a, field), getattr(b, field))
+
+
+def render(genre, seed, first_bar, bars):
+    drums, groove = core.generate_drum_events(genre, 120, energy=CURVE, bars=bars, rng=seed,
+                                              first_bar=first_bar, with_groove=True)
+    bass = core.generate_bass_events(genre, 120, energy=CURVE, bars=bars, rng=seed, first_bar=first_bar, groove=groove)
+    melody = core.generate_melody_events(genre, 120, energy=CURVE, bars=bars, rng=seed, first_bar=first_bar, groove=groove)
+    return drums, bass, melody
+
+
+@pytest.mark.parametrize("genre", GENRES)
+@pytest.mark.parametrize("seed", [3, -8])
+@pytest.mark.parametrize("edges", [(0, 5, 6, 16), (0, 1, 2, 3, 16), (0, 8, 16)])
+def test_bar_ranges_match_the_longer_render(genre, seed, edges):
+    full = render(genre, seed, 0, edges[-1])
+    ranges = list(zip(edges[:-1], edges[1:]))
+    # Ranges generated out of order still line up with the same bars of the full render
+    parts = {lo: render(genre, seed, lo, hi - lo) for lo, hi in reversed(ranges)}
+    for track, expected in enumerate(full):
+        assert_same(core.EventBlock.merge([parts[lo][track] for lo, _ in ranges]), expected)
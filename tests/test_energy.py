@@ -0,0 +1,23 @@
+from fractions import Fraction
+
+import numpy as np
+import pytest
+
+import beat_starter_core as core
+
+
+def plan(energy):
+    return {"genre": "techno_peak", "bpm": 126, "mood": "dark", "energy": energy}
+
+
+@pytest.mark.parametrize("energy", [6, 6.4, 6.6, 0.2, 12, np.float32(3.7), Fraction(13, 2)])
+def test_scalar_exports_like_a_constant_curve(energy):
+    scalar = core.export_midi(plan(energy), None, seed=11, cache=False)
+    assert core.export_midi(plan([energy] * 8), None, seed=11, cache=False) == scalar
+
+
+def test_scalar_energies_share_rounded_drum_grids():
+    for energy in np.arange(5.0, 5.5, 0.01):
+        core.export_midi(plan(float(energy)), None, seed=11, cache=False)
+    levels = {key[1] for key in core._DRUM_GRID_CACHE if key[0] == "techno_peak"}
+    assert levels <= set(range(1, 11))
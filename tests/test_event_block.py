@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+import beat_starter_core as core
+
+
+def sorted_block(rng, n, lo, hi):
+    tick = np.sort(rng.integers(lo, hi, n))
+    return core.EventBlock(tick, rng.integers(0, 128, n), rng.integers(0, 128, n), rng.integers(1, 500, n))
+
+
+def lexsort_merge(blocks):
+    """Reference: stable order by tick, ties by block then position within the block."""
+    merged = core.EventBlock.concatenate(blocks)
+    block_id = np.concatenate([np.full(len(b), i) for i, b in enumerate(blocks)] or [np.empty(0, int)])
+    position = np.arange(len(merged))
+    return merged[np.lexsort((position, block_id, merged.tick))]
+
+
+def assert_same(a, b):
+    for field in ("tick", "pitch", "vel", "dur"):
+        np.testing.assert_array_equal(getattr(a, field), getattr(b, field))
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_merge_matches_lexsort(seed):
+    rng = np.random.default_rng(seed)
+    blocks, start = [], 0
+    for _ in range(rng.integers(0, 6)):
+        # Time-ordered ranges that may overlap their neighbours (or not at all)
+        start += int(rng.integers(-300, 1000))
+        blocks.append(sorted_block(rng, int(rng.integers(0, 40)), max(0, start), max(0, start) + int(rng.integers(1, 1500))))
+    assert_same(core.EventBlock.merge(blocks), lexsort_merge(blocks))
+
+
+def test_merge_of_interleaved_blocks():
+    rng = np.random.default_rng(1)
+    blocks = [sorted_block(rng, 500, 0, 100) for _ in range(4)]
+    assert_same(core.EventBlock.merge(blocks), lexsort_merge(blocks))
+
+
+def test_sorted_is_stable():
+    block = core.EventBlock([5, 1, 5, 1], [1, 2, 3, 4], [10, 20, 30, 40], [1, 1, 1, 1]).sorted()
+    assert list(block.tick) == [1, 1, 5, 5]
+    assert list(block.pitch) == [2, 4, 1, 3]
@@ -0,0 +1,130 @@
+import os
+from fractions import Fraction
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import beat_starter_core as core
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    core.configure_export_cache(max_entries=256, disk_dir=None)
+    core.clear_export_cache()
+    yield
+    core.clear_export_cache()
+
+
+def plan(energy=6, genre="techno"):
+    return {"genre": genre, "bpm": 124, "mood": "dark", "energy": energy}
+
+
+def test_seeded_export_hits_cache():
+    first = core.export_midi(plan(), None, seed=7)
+    assert len(core._EXPORT_CACHE) == 1
+    assert core.export_midi(plan(), None, seed=7) == first
+    assert len(core._EXPORT_CACHE) == 1
+
+
+def test_different_inputs_miss_cache():
+    first = core.export_midi(plan(), None, seed=7)
+    assert core.export_midi(plan(), None, seed=8) != first
+    assert core.export_midi(plan(genre="house"), None, seed=7) != first
+    assert len(core._EXPORT_CACHE) == 3
+
+
+def test_unseeded_export_is_not_cached():
+    core.export_midi(plan(), None)
+    assert len(core._EXPORT_CACHE) == 0
+
+
+def test_numpy_scalars_key_like_python_numbers():
+    assert core._export_cache_key(plan(np.int64(6)), seed=7) == core._export_cache_key(plan(6), seed=7)
+
+
+def test_unknown_types_are_not_cached():
+    assert core._export_cache_key(plan(object()), seed=7) is None
+    fresh = core.export_midi(plan(Fraction(7)), None, seed=7, cache=False)
+    assert core.export_midi(plan(Fraction(7)), None, seed=7) == fresh
+    assert len(core._EXPORT_CACHE) == 0
+
+
+def test_negative_seeds_are_cached_like_any_other():
+    assert core._export_cache_key(plan(), seed=-5) != core._export_cache_key(plan(), seed=5)
+    fresh = core.export_midi(plan(), None, seed=-5, cache=False)
+    assert core.export_midi(plan(), None, seed=-5) == fresh
+    assert core.export_midi(plan(), None, seed=-5) == fresh
+    assert len(core._EXPORT_CACHE) == 1
+
+
+def test_invalid_seeds_get_no_key():
+    assert core._export_cache_key(plan(), seed="abc") is None
+
+
+def test_long_curves_differing_in_the_middle_do_not_collide():
+    bars = 2000
+    low = np.full(bars, 3)
+    high = low.copy()
+    high[bars // 2] = 9
+    assert core._export_cache_key(plan(low), seed=7) != core._export_cache_key(plan(high), seed=7)
+    first = core.export_midi(plan(low), None, bars=bars, seed=7)
+    assert core.export_midi(plan(high), None, bars=bars, seed=7) != first
+
+
+def test_energy_curve_keys_by_levels():
+    curve = [2, 4, 6, 8, 9, 7, 5, 3]
+    key = core._export_cache_key(plan(curve), seed=7)
+    assert core._export_cache_key(plan(np.array(curve)), seed=7) == key
+    assert core._export_cache_key(plan(tuple(curve)), seed=7) == key
+    assert core._export_cache_key(plan(np.array(curve, dtype=np.float32)), seed=7) == key
+
+
+def test_cached_curve_export_matches_uncached():
+    curve = np.array([2, 4, 6, 8, 9, 7, 5, 3])
+    fresh = core.export_midi(plan(curve), None, seed=7, cache=False)
+    assert core.export_midi(plan(curve), None, seed=7) == fresh
+    assert len(core._EXPORT_CACHE) == 1
+    assert core.export_midi(plan(curve.tolist()), None, seed=7) == fresh
+    assert len(core._EXPORT_CACHE) == 1
+    curve[4] = 1
+    assert core.export_midi(plan(curve), None, seed=7) != fresh
+    assert len(core._EXPORT_CACHE) == 2
+
+
+def test_truncated_disk_entries_are_misses(tmp_path):
+    core.configure_export_cache(max_entries=0, disk_dir=str(tmp_path))
+    fresh = core.export_midi(plan(), None, seed=7)
+    (path,) = tmp_path.glob("*.mid")
+    for broken in (b"", fresh[:-5]):
+        path.write_bytes(broken)
+        assert core.export_midi(plan(), None, seed=7) == fresh
+
+
+def test_concurrent_disk_writes_never_serve_partial_files(tmp_path):
+    core.configure_export_cache(max_entries=0, disk_dir=str(tmp_path))
+    data = core.export_midi(plan(), None, seed=7, cache=False)
+    key = core._export_cache_key(plan(), seed=7)
+    stop = threading.Event()
+    bad = []
+
+    def write():
+        while not stop.is_set():
+            core._export_cache_put(key, data)
+
+    writers = [threading.Thread(target=write) for _ in range(3)]
+    for thread in writers:
+        thread.start()
+    try:
+        deadline = time.perf_counter() + 1.0
+        while time.perf_counter() < deadline:
+            got = core._export_cache_get(key)
+            if got is not None and got != data:
+                bad.append(got)
+    finally:
+        stop.set()
+        for thread in writers:
+            thread.join()
+    assert not bad
+    assert [name for name in os.listdir(tmp_path) if not name.endswith(".mid")] == []
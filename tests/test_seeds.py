@@ -0,0 +1,26 @@
+import pytest
+
+import beat_starter_core as core
+
+PLAN = {"genre": "hiphop_boom_bap", "bpm": 92, "mood": "chill", "energy": 6}
+
+
+@pytest.mark.parametrize("seed", [-5, -1, 7, 2**40])
+def test_int_seeds_reproduce(seed):
+    first = core.export_midi(PLAN, None, seed=seed, cache=False)
+    assert core.export_midi(PLAN, None, seed=seed, cache=False) == first
+
+
+def test_negative_seed_differs_from_its_absolute_value():
+    assert core.export_midi(PLAN, None, seed=-5, cache=False) != core.export_midi(PLAN, None, seed=5, cache=False)
+
+
+def test_generators_accept_negative_seeds():
+    for generate in (core.generate_drum_events, core.generate_bass_events, core.generate_melody_events):
+        a, b = generate("hiphop_boom_bap", 92, rng=-3), generate("hiphop_boom_bap", 92, rng=-3)
+        assert a.tick.tolist() == b.tick.tolist()
+
+
+def test_invalid_seed_raises():
+    with pytest.raises(ValueError):
+        core.export_midi(PLAN, None, seed="abc", cache=False)
@@ -0,0 +1,65 @@
+import io
+
+import numpy as np
+import pytest
+
+import beat_starter_core as core
+
+mido = pytest.importorskip("mido")
+
+
+def random_block(rng, n, max_tick=20000):
+    tick = np.sort(rng.integers(0, max_tick, n))
+    return core.EventBlock(tick, rng.integers(0, 128, n), rng.integers(0, 128, n), rng.integers(1, 2000, n))
+
+
+def parse(data):
+    """mido view of SMF bytes: (ppq, tempo, [(name, program, channel, ons, offs)])."""
+    midi = mido.MidiFile(file=io.BytesIO(data))
+    tempo = next(msg.tempo for msg in midi.tracks[0] if msg.type == "set_tempo")
+    tracks = []
+    for track in midi.tracks[1:]:
+        name, program, channel, ons, offs, now = None, None, None, [], [], 0
+        for msg in track:
+            now += msg.time
+            if msg.type == "track_name":
+                name = msg.name
+            elif msg.type == "program_change":
+                program, channel = msg.program, msg.channel
+            elif msg.type == "note_on" and msg.velocity:
+                ons.append((now, msg.note, msg.velocity))
+            elif msg.type in ("note_on", "note_off"):
+                offs.append((now, msg.note))
+        tracks.append((name, program, channel, sorted(ons), sorted(offs)))
+    return midi.ticks_per_beat, tempo, tracks
+
+
+def expected(name, program, channel, block):
+    ons = sorted((t, p, max(v, 1)) for t, p, v, _ in block)
+    offs = sorted((t + d, p) for t, p, _, d in block)
+    return name, program, channel, ons, offs
+
+
+@pytest.fixture
+def tracks():
+    rng = np.random.default_rng(3)
+    return [("Drums", 0, True, random_block(rng, 400)),
+            ("Bass", 34, False, random_block(rng, 300)),
+            ("Melody", 81, False, random_block(rng, 0)),
+            ("Lead", 90, False, random_block(rng, 50, max_tick=3_000_000))]
+
+
+def test_write_smf_round_trips_through_mido(tracks):
+    ppq, tempo, parsed = parse(core.write_smf(tracks, 128))
+    assert ppq == core.PPQ
+    assert tempo == round(60000000 / 128)
+    assert parsed == [expected("Drums", 0, 9, tracks[0][3]), expected("Bass", 34, 0, tracks[1][3]),
+                      expected("Melody", 81, 1, tracks[2][3]), expected("Lead", 90, 2, tracks[3][3])]
+
+
+def test_write_smf_stream_matches_write_smf(tracks):
+    chunked = [(name, program, is_drum, [block[i:i + 37] for i in range(0, len(block), 37)])
+               for name, program, is_drum, block in tracks]
+    data = core.write_smf_stream(io.BytesIO(), chunked, 128).getvalue()
+    assert data == core.write_smf(tracks, 128)
+    assert parse(data) == parse(core.write_smf(tracks, 128))
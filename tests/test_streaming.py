@@ -0,0 +1,27 @@
+import numpy as np
+import pytest
+
+import beat_starter_core as core
+
+GENRES = ["techno_acid", "hiphop_west_coast", "drum_and_bass_liquid", "uk_garage"]
+
+
+@pytest.mark.parametrize("genre", GENRES)
+@pytest.mark.parametrize("bars", [8, 13])
+@pytest.mark.parametrize("chunk_bars", [1, 3, 5, 16])
+def test_streamed_export_matches_in_memory(genre, bars, chunk_bars):
+    plan = {"genre": genre, "bpm": 118, "mood": "dark", "energy": [4, 8, 6]}
+    in_memory = core.export_midi(plan, None, bars=bars, seed=21, cache=False)
+    assert core.export_midi(plan, None, bars=bars, seed=21, streaming=True, chunk_bars=chunk_bars) == in_memory
+
+
+@pytest.mark.parametrize("chunk_bars", [1, 3, 7])
+def test_event_streams_concatenate_to_the_full_render(chunk_bars):
+    for stream, generate in ((core.stream_drum_events, core.generate_drum_events),
+                             (core.stream_bass_events, core.generate_bass_events)):
+        chunks = list(stream("hiphop_trap", energy=7, bars=10, chunk_bars=chunk_bars, rng=4))
+        assert all(len(chunk) for chunk in chunks)
+        streamed = core.EventBlock.merge(chunks)
+        full = generate("hiphop_trap", 120, energy=7, bars=10, rng=4)
+        np.testing.assert_array_equal(streamed.tick, full.tick)
+        np.testing.assert_array_equal(streamed.pitch, full.pitch)
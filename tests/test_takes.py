@@ -0,0 +1,24 @@
+import pytest
+
+import beat_starter_core as core
+
+GENRES = ["techno", "hiphop_boom_bap", "drum_and_bass_stepper", "trance_uplifting"]
+OPTIONS = {"break_preset": "amen", "hat_layout": "standard", "include_melody": True}
+
+
+@pytest.mark.parametrize("genre", GENRES)
+@pytest.mark.parametrize("seed", [5, 77])
+def test_take_exports_like_export_midi(genre, seed):
+    plan = {"genre": genre, "bpm": 124, "mood": "uplifting", "energy": 7}
+    take = core.render_take(plan, seed=seed, **OPTIONS)
+    for humanize in (0.0, 0.6, 1.0):
+        expected = core.export_midi(plan, None, seed=seed, humanize_intensity=humanize, cache=False, **OPTIONS)
+        assert core.export_take(take, None, humanize_intensity=humanize) == expected
+
+
+@pytest.mark.parametrize("bpm", [90, 124, 174])
+def test_take_tempo_change_matches_a_fresh_export(bpm):
+    plan = {"genre": "hiphop_west_coast", "bpm": 124, "mood": "dark", "energy": [3, 6, 9]}
+    take = core.render_take(plan, seed=12)
+    expected = core.export_midi(dict(plan, bpm=bpm), None, seed=12, cache=False)
+    assert core.export_take(take, None, bpm=bpm) == expected
@@ -0,0 +1,32 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import beat_starter_core as core
+
+PLAN = {"genre": "drum_and_bass_neuro", "bpm": 172, "mood": "dark", "energy": 8}
+
+
+@pytest.fixture
+def executor():
+    config = dict(core._TRACK_POOL_CONFIG)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        core.configure_track_pool(max_workers=3, executor=pool, min_bars=1)
+        yield pool
+    core._TRACK_POOL_CONFIG.update(config)
+
+
+def test_parallel_render_matches_sequential(executor):
+    sequential = core.export_midi(PLAN, None, bars=16, seed=5, cache=False)
+    assert core.export_midi(PLAN, None, bars=16, seed=5, cache=False, parallel=True) == sequential
+
+
+def test_short_renders_stay_sequential(executor):
+    core.configure_track_pool(min_bars=64)
+    calls = []
+    submit = executor.submit
+    executor.submit = lambda *args, **kwargs: calls.append(args) or submit(*args, **kwargs)
+    core.export_midi(PLAN, None, bars=16, seed=5, cache=False, parallel=True)
+    assert not calls
+    core.export_midi(PLAN, None, bars=64, seed=5, cache=False, parallel=True)
+    assert calls